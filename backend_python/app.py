@@ -1,34 +1,49 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
 import json
 import time
 import random
-import numpy as np
 import cv2
 from datetime import datetime
+from urllib.parse import urlencode
 import threading
 import logging
-from dotenv import load_dotenv
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 
+from config import (
+    CAMERA_ROIS, CAMERA_STREAMS, CLIP_ENCODER_WORKERS, EVENT_CLIENT_BUFFER, FRAME_POOL_SLOTS,
+    INCIDENT_DB_PATH, INCIDENT_MIN_INTERVAL_SECONDS, INCIDENTS_PAGE_SIZE, INFERENCE_BATCH_SIZE,
+    JOB_STATE_PATH, MAX_LONG_POLL_SECONDS, MAX_QUEUED_JOBS, MAX_WORKERS, MODEL_CONFIG, MODEL_NAME, MODEL_PATH,
+    PROCESSED_FOLDER, SAMPLING_MODE, STATS_HISTORY_SAMPLES, STATS_INTERVAL_SECONDS, STATS_ROLLUP_HISTORY,
+    STATS_ROLLUP_SAMPLES, STREAM_INITIAL_INTERVAL, STREAM_LATENCY_BUDGET_MS, UPLOAD_FOLDER,
+    ALLOWED_EXTENSIONS, VIDEO_SHARD_WORKERS
+)
 # Import our simulated YOLO model
-from models.yolo_sim import load_model
+from models.registry import get_model, model_registry
+from jobs import JobManager, JobQueueFull
+from video_source import FrameSampler
+from streams import CameraStream, StreamManager
+from governor import LatencyGovernor
+from clips import ClipEncoder
+from store import IncidentStore
+from events import EventBroker
+from roi import RegionOfInterest
+from state import CameraRegistry
+from detection import (DetectionSession, create_frame_pool, create_letterbox, create_motion_gate,
+                       detect_in_roi, run_detection)
+from shards import init_shard_worker, run_video_shard, shard_bounds, shard_count
+from metrics import MetricsCollector, StageTimer, SystemMetricsReader, pipeline_counters, render_prometheus
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-
 app = Flask(__name__)
-CORS(app)
-
-# Configuration
-UPLOAD_FOLDER = 'data/uploads/videos'
-PROCESSED_FOLDER = 'data/processed/videos'
-MODEL_PATH = 'backend_python/models'
-ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov'}
+CORS(app, expose_headers=['X-Next-Cursor', 'Link'])
 
 # Create necessary directories if they don't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -53,236 +68,527 @@ system_state = {
 }
 
 # Mock data for cameras and incidents (will be replaced with actual detection)
-cameras = {
-    "cam1": {
+cameras = CameraRegistry([
+    {
         "id": "cam1",
         "name": "Highway Junction A",
         "location": "I-95 North, Mile 42",
         "status": "monitoring",
+        "streamUrl": None,
+        "roi": None,
         "detections": []
     },
-    "cam2": {
+    {
         "id": "cam2",
         "name": "City Center",
         "location": "Main St & 5th Ave",
         "status": "monitoring",
+        "streamUrl": None,
+        "roi": None,
         "detections": []
     },
-    "cam3": {
+    {
         "id": "cam3",
         "name": "Industrial Park",
         "location": "Warehouse District, Lot C",
         "status": "monitoring",
+        "streamUrl": None,
+        "roi": None,
         "detections": []
     },
-    "cam4": {
+    {
         "id": "cam4",
         "name": "Residential Area",
         "location": "Oak Street & Elm Drive",
         "status": "monitoring",
+        "streamUrl": None,
+        "roi": None,
         "detections": []
     }
-}
+])
+
+# Compiled regions of interest of the cameras that have one (see set_camera_roi)
+camera_rois = {}
 
-incidents = []
-current_incident_id = 1
+# Push channel for incidents, camera status and stats
+event_broker = EventBroker(max_buffer=EVENT_CLIENT_BUFFER)
+
+# Incidents are persisted in SQLite; ids continue from the last stored incident
+incident_store = IncidentStore(INCIDENT_DB_PATH)
 
 # Helper functions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def process_video(video_path, camera_id):
-    """Process a video file to detect accidents using our simulated YOLOv8 model"""
-    global current_incident_id
+def update_camera(camera_id, expect=None, **fields):
+    """
+    Update a camera's fields, notifying clients when its status changes
+
+    Args:
+        camera_id: Camera to update
+        expect: Field values the camera must have for the update to apply (see CameraRegistry.update)
+        **fields: New field values
+    """
+    result = cameras.update(camera_id, expect, **fields)
+    if result is not None:
+        previous, camera = result
+        if camera['status'] != previous['status']:
+            event_broker.publish("camera-status-changed", camera)
+
+def set_camera_roi(camera_id, polygon):
+    """
+    Set or clear a camera's region of interest
+
+    Args:
+        camera_id: Camera to update
+        polygon: [x, y] points as fractions of the frame size, or None for the whole frame
+
+    Raises:
+        ValueError: If the polygon is malformed
+    """
+    if polygon is None:
+        camera_rois.pop(camera_id, None)
+    else:
+        roi = RegionOfInterest(polygon)
+        polygon = roi.to_list()
+        camera_rois[camera_id] = roi
+    update_camera(camera_id, roi=polygon)
+
+def incident_basename(incident_id, incident_timestamp):
+    """Name (without extension) of an incident's snapshot and clip files"""
+    return f"incident_{incident_id}_{incident_timestamp.strftime('%Y%m%d_%H%M%S')}"
+
+def publish_incident(camera_id, detection, incident_timestamp, save_media):
+    """
+    Record a detected incident: update the camera, persist the incident and
+    push it to connected dashboards
+    
+    The store gives the incident its id as it is added; its files are named
+    after the id, so save_media puts them in place before clients are told.
+    
+    Args:
+        camera_id: Camera the incident was detected on
+        detection: The accident detection, in the API format
+        incident_timestamp: When the incident was detected (datetime)
+        save_media: Called with the incident's file basename to write (or move)
+            its snapshot and clip into PROCESSED_FOLDER as <basename>.jpg / .mp4
+    
+    Returns:
+        The incident's id
+    """
+    accident_type = detection["label"]
+    confidence = detection["confidence"]
+    
+    # Update camera status
+    update_camera(camera_id, status="incident", detections=[detection])
+    
+    # Create incident record
+    timestamp = incident_timestamp.isoformat()
+    timeAgo = "just now"
+    
+    # Get severity based on confidence
+    severity = "low"
+    if confidence > 0.85:
+        severity = "high"
+    elif confidence > 0.7:
+        severity = "medium"
+    
+    details = {
+        "vehiclesInvolved": random.randint(1, 3),
+        "peopleDetected": random.randint(0, 5),
+        "notificationsSent": True,
+        "notificationRecipients": random.randint(1, 5)
+    }
+    
+    def build_incident(incident_id):
+        basename = incident_basename(incident_id, incident_timestamp)
+        return {
+            "id": str(incident_id),
+            "cameraId": camera_id,
+            "location": cameras[camera_id]["location"],
+            "timestamp": timestamp,
+            "timeAgo": timeAgo,
+            "type": accident_type,
+            "severity": severity,
+            "imageUrl": f"/data/processed/videos/{basename}.jpg",
+            "videoUrl": f"/data/processed/videos/{basename}.mp4",
+            "detections": [detection],
+            "details": details
+        }
+    
+    # Persist the incident and push it to connected dashboards
+    new_incident = incident_store.add(build_incident)
+    incident_id = int(new_incident["id"])
+    save_media(incident_basename(incident_id, incident_timestamp))
+    event_broker.publish("incident-created", new_incident)
+    
+    # Log the detection
+    logger.info(f"Accident detected: {accident_type} at {timestamp} on camera {camera_id}")
+    return incident_id
+
+class PublishingSession(DetectionSession):
+    """
+    DetectionSession that publishes each incident as soon as it is
+    confirmed, and puts the camera back to monitoring once things calm down.
+    """
+    
+    def __init__(self, camera_id, yolo_model, fps, sample_interval=1, timer=None):
+        super().__init__(camera_id, yolo_model, fps, clip_encoder, sample_interval, timer)
+    
+    def raise_incident(self, detection, incident_timestamp, video_time, snapshot):
+        publish_incident(self.camera_id, detection, incident_timestamp,
+                         lambda basename: self.save_media(basename, snapshot, video_time))
+    
+    def on_quiet(self, video_time):
+        # Update camera status to normal monitoring if some time has passed
+        if cameras[self.camera_id]['status'] == "incident" and (video_time - self.last_incident_time > 3):
+            # Unless another worker raised a new incident in the meantime
+            update_camera(self.camera_id, expect={"status": "incident"}, status="monitoring", detections=[])
+
+def process_video(video_path, camera_id, progress=None):
+    """
+    Process a video file to detect accidents using our simulated YOLOv8 model
+
+    Args:
+        video_path: Path of the video file to process
+        camera_id: Camera the video is attributed to
+        progress: Optional callback receiving progress fields as keyword arguments
+
+    Returns:
+        Summary of the run (frames processed and incidents detected)
+    """
     logger.info(f"Processing video: {video_path} for camera {camera_id}")
     
-    # Load the YOLO model
-    yolo_model = load_model("yolov8n.pt")  # The path is not used in our simulation
+    # Use the shared YOLO model (loaded once per process)
+    yolo_model = get_model(MODEL_NAME, **MODEL_CONFIG)  # The path is not used in our simulation
     
     # Open the video file
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         logger.error(f"Error opening video file: {video_path}")
-        return
+        raise IOError(f"Error opening video file: {video_path}")
     
-    frame_count = 0
-    processed_frames = 0
     fps = cap.get(cv2.CAP_PROP_FPS)
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     processing_interval = max(1, int(fps / 4))  # Process every X frames
     
     # Update camera status to reflect that processing has started
-    cameras[camera_id]['status'] = "monitoring"
+    update_camera(camera_id, status="monitoring")
     
-    # Keep track of when we last triggered an incident
-    last_incident_time = 0
-    min_incident_interval = 5  # Minimum seconds between incidents
-    output_writer = None
-    output_video_path = None
+    # Long videos are split into time ranges processed in parallel
+    shards = shard_count(total_frames, fps)
+    if shards > 1:
+        cap.release()
+        return process_video_sharded(video_path, camera_id, fps, total_frames, processing_interval,
+                                     shards, progress)
     
-    # For saving video clips of incidents
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    timer = StageTimer(camera=camera_id)
+    session = PublishingSession(camera_id, yolo_model, fps, processing_interval, timer)
+    sampler = FrameSampler(cap, processing_interval, INFERENCE_BATCH_SIZE, SAMPLING_MODE, timer,
+                           pool=create_frame_pool(cap, INFERENCE_BATCH_SIZE))
+    gate, pipeline = run_detection(session, sampler, lambda: camera_rois.get(camera_id), timer,
+                                   progress, total_frames)
     
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        frame_count += 1
-        
-        # Process every X frames to improve performance
-        if frame_count % processing_interval != 0:
+    # Release the video
+    cap.release()
+    logger.info(f"Finished processing video. Processed {session.processed_frames} frames out of {total_frames} total frames "
+                f"({session.inferred_frames} inferred).")
+    logger.info(f"Pipeline stage timings: {pipeline.stats_dict()}")
+
+    summary = {
+        "framesDecoded": sampler.frames_decoded,
+        "framesRetrieved": sampler.frames_retrieved,
+        "samplingMode": sampler.mode,
+        "framesInferred": session.inferred_frames,
+        "totalFrames": total_frames,
+        "incidentsFound": session.incidents_found,
+        "tracking": session.tracker.stats(),
+        "motion": gate.stats() if gate is not None else None,
+        "stages": pipeline.stats_dict()
+    }
+    if progress:
+        progress(**summary)
+    return summary
+
+def get_shard_pool():
+    """Process pool running video shards, started on first use"""
+    global shard_pool
+    with shard_pool_lock:
+        if shard_pool is None:
+            # Spawned workers only import the shard code (see shards.py)
+            shard_pool = ProcessPoolExecutor(max_workers=VIDEO_SHARD_WORKERS,
+                                             mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=init_shard_worker)
+        return shard_pool
+
+def merge_shard_incidents(camera_id, shard_results):
+    """
+    Debounce the incidents of all shards across shard boundaries, then
+    publish the survivors in video order, renaming their files after the
+    ids they get
+    
+    Returns:
+        Number of incidents published
+    """
+    incidents = sorted((incident for result in shard_results for incident in result["incidents"]),
+                       key=lambda incident: incident["videoTime"])
+    kept = []
+    last_incident_time = -math.inf
+    for incident in incidents:
+        if incident["videoTime"] - last_incident_time <= INCIDENT_MIN_INTERVAL_SECONDS:
+            # Too close to the previous incident (possibly from another shard)
+            for filename in (incident["imageFilename"], incident["videoFilename"]):
+                path = os.path.join(PROCESSED_FOLDER, filename)
+                if os.path.exists(path):
+                    os.remove(path)
             continue
-        
-        processed_frames += 1
-        
-        # Run YOLO detection on the frame
-        detections = yolo_model.predict(frame)
-        
-        # Draw annotations on the frame for visualization
-        annotated_frame = yolo_model.annotate_frame(frame, detections)
-        
-        # Check if any detections are accidents
-        accident_detections = [d for d in detections if d["class_name"] in yolo_model.accident_classes]
-        
-        current_time = time.time()
-        incident_detected = len(accident_detections) > 0 and (current_time - last_incident_time > min_incident_interval)
-        
-        if incident_detected:
-            last_incident_time = current_time
-            
-            # Get the most confident accident detection
-            accident = max(accident_detections, key=lambda x: x["confidence"])
-            accident_type = accident["class_name"]
-            x1, y1, x2, y2 = map(int, accident["box"])
-            
-            # Convert YOLO detection to our detection format
-            detection = {
-                "label": accident_type,
-                "confidence": accident["confidence"],
-                "x": x1,
-                "y": y1,
-                "width": x2 - x1,
-                "height": y2 - y1
-            }
-            
-            # Save frame as image
-            incident_timestamp = datetime.now()
-            image_filename = f"incident_{current_incident_id}_{incident_timestamp.strftime('%Y%m%d_%H%M%S')}.jpg"
-            image_path = os.path.join(PROCESSED_FOLDER, image_filename)
-            cv2.imwrite(image_path, annotated_frame)
-            
-            # Create video clip for the incident
-            video_filename = f"incident_{current_incident_id}_{incident_timestamp.strftime('%Y%m%d_%H%M%S')}.mp4"
-            output_video_path = os.path.join(PROCESSED_FOLDER, video_filename)
-            
-            # Save a 5-second clip (continued in next iterations)
-            frame_height, frame_width = frame.shape[:2]
-            output_writer = cv2.VideoWriter(
-                output_video_path, fourcc, fps, 
-                (frame_width, frame_height)
-            )
-            
-            # Write the current annotated frame
-            if output_writer.isOpened():
-                output_writer.write(annotated_frame)
-            
-            # Update camera status
-            cameras[camera_id]['status'] = "incident"
-            cameras[camera_id]['detections'] = [detection]
-            
-            # Create incident record
-            timestamp = incident_timestamp.isoformat()
-            timeAgo = "just now"
-            
-            # Get severity based on confidence
-            severity = "low"
-            if accident["confidence"] > 0.85:
-                severity = "high"
-            elif accident["confidence"] > 0.7:
-                severity = "medium"
-            
-            # Create new incident
-            new_incident = {
-                "id": str(current_incident_id),
-                "cameraId": camera_id,
-                "location": cameras[camera_id]["location"],
-                "timestamp": timestamp,
-                "timeAgo": timeAgo,
-                "type": accident_type,
-                "severity": severity,
-                "imageUrl": f"/data/processed/videos/{image_filename}",
-                "videoUrl": f"/data/processed/videos/{video_filename}",
-                "detections": [detection],
-                "details": {
-                    "vehiclesInvolved": random.randint(1, 3),
-                    "peopleDetected": random.randint(0, 5),
-                    "notificationsSent": True,
-                    "notificationRecipients": random.randint(1, 5)
-                }
-            }
-            
-            # Add to incidents list
-            incidents.append(new_incident)
-            current_incident_id += 1
-            
-            # Log the detection
-            logger.info(f"Accident detected: {accident_type} at {timestamp} on camera {camera_id}")
-        elif output_writer is not None and output_writer.isOpened():
-            # Continue writing frames to the incident clip for a short duration
-            output_writer.write(annotated_frame)
-            
-            # Close the video writer after some frames to limit clip length
-            if frame_count % (fps * 3) == 0:  # Approximately 3 seconds of video
-                output_writer.release()
-                output_writer = None
-                logger.info(f"Saved incident clip: {output_video_path}")
+        last_incident_time = incident["videoTime"]
+        kept.append(incident)
+    
+    for incident in kept:
+        files = (incident["imageFilename"], incident["videoFilename"])
+        publish_incident(camera_id, incident["detection"], datetime.fromisoformat(incident["timestamp"]),
+                         partial(rename_media, files))
+    return len(kept)
+
+def rename_media(files, basename):
+    """Move an incident's (snapshot, clip) files in PROCESSED_FOLDER to <basename>.jpg and <basename>.mp4"""
+    for filename, extension in zip(files, (".jpg", ".mp4")):
+        path = os.path.join(PROCESSED_FOLDER, filename)
+        if os.path.exists(path):
+            os.replace(path, os.path.join(PROCESSED_FOLDER, basename + extension))
+
+def sum_stats(stats):
+    """Add up the counts in per-shard stats dicts (None entries are skipped)"""
+    stats = [entry for entry in stats if entry]
+    if not stats:
+        return None
+    return {key: sum(entry[key] for entry in stats) for key, value in stats[0].items() if isinstance(value, int)}
+
+def process_video_sharded(video_path, camera_id, fps, total_frames, interval, shards, progress=None):
+    """
+    Process a long video as time-range shards in the shard process pool
+    
+    Args:
+        video_path: Path of the video file to process
+        camera_id: Camera the video is attributed to
+        fps: Frame rate of the video
+        total_frames: Frames in the video
+        interval: Source frames per processed frame
+        shards: Number of shards to split the video into
+        progress: Optional callback receiving progress fields as keyword arguments
+    
+    Returns:
+        Summary of the run, with per-shard details under "shards"
+    """
+    bounds = shard_bounds(total_frames, interval, shards)
+    logger.info(f"Processing video in {len(bounds)} shards: {video_path}")
+    roi = camera_rois.get(camera_id)
+    roi_polygon = roi.to_list() if roi is not None else None
+    pool = get_shard_pool()
+    futures = {
+        pool.submit(run_video_shard, video_path, camera_id, after, until, interval, roi_polygon): i
+        for i, (after, until) in enumerate(bounds)
+    }
+    
+    results = [None] * len(bounds)
+    try:
+        for future in as_completed(futures):
+            result = results[futures[future]] = future.result()
+            for name, count in result["counters"].items():
+                pipeline_counters.add(name, count)
+            if progress:
+                done = [entry for entry in results if entry is not None]
+                progress(framesDecoded=sum(entry["framesDecoded"] for entry in done),
+                         framesInferred=sum(entry["framesInferred"] for entry in done),
+                         totalFrames=total_frames, shardsCompleted=len(done), shards=len(bounds))
+    except Exception:
+        for future in futures:
+            future.cancel()
+        raise
+    
+    incidents_found = merge_shard_incidents(camera_id, results)
+    frames_inferred = sum(result["framesInferred"] for result in results)
+    logger.info(f"Finished processing video. Processed {frames_inferred} frames out of {total_frames} total frames "
+                f"in {len(results)} shards.")
+    
+    stages = {}
+    for result in results:
+        for name, stage in result["stages"].items():
+            total = stages.setdefault(name, {"items": 0, "busySeconds": 0.0, "waitSeconds": 0.0})
+            total["items"] += stage["items"]
+            total["busySeconds"] += stage["busySeconds"]
+            total["waitSeconds"] += stage["waitSeconds"]
+    for stage in stages.values():
+        stage["busySeconds"] = round(stage["busySeconds"], 4)
+        stage["waitSeconds"] = round(stage["waitSeconds"], 4)
+        stage["avgMs"] = round(stage["busySeconds"] / stage["items"] * 1000, 2) if stage["items"] else 0.0
+    
+    summary = {
+        "framesDecoded": sum(result["framesDecoded"] for result in results),
+        "framesRetrieved": sum(result["framesRetrieved"] for result in results),
+        "samplingMode": results[0]["samplingMode"],
+        "framesInferred": frames_inferred,
+        "totalFrames": total_frames,
+        "incidentsFound": incidents_found,
+        "tracking": sum_stats(result["tracking"] for result in results),
+        "motion": sum_stats(result["motion"] for result in results),
+        "stages": stages,
+        "shards": [{key: value for key, value in result.items() if key not in ("incidents", "counters")}
+                   for result in results]
+    }
+    if progress:
+        progress(**summary)
+    return summary
+
+def run_video_job(job, video_path, camera_id):
+    """Job handler that processes a queued video and reports progress on the job"""
+    return process_video(video_path, camera_id,
+                         progress=lambda **fields: job_manager.update_progress(job.id, **fields))
+
+def set_camera_status(camera_id, status):
+    """Mirror a live stream's connection state on the camera"""
+    # A stream stopped on purpose leaves the camera as it was before the stream started
+    update_camera(camera_id, status="monitoring" if status == "stopped" else status)
+
+def create_camera_stream(camera_id, source, **options):
+    """Build the ingestion worker for a live camera feed"""
+    yolo_model = get_model(MODEL_NAME, **MODEL_CONFIG)
+    timer = StageTimer(camera=camera_id)
+    gate = create_motion_gate()
+    letterbox = create_letterbox()
+    session = None
+    
+    def process_frame(frame_number, frame, fps):
+        nonlocal session
+        if session is None:
+            session = PublishingSession(camera_id, yolo_model, fps, timer=timer)
+        roi = camera_rois.get(camera_id)
+        with timer.measure("motion"):
+            moving = gate is None or gate.check(roi.crop(frame) if roi is not None else frame)
+        if moving:
+            detections = detect_in_roi(yolo_model, roi, frame[None], letterbox=letterbox, timer=timer,
+                                       stream=session)[0]
+            pipeline_counters.add("framesInferred")
         else:
-            # Update camera status to normal monitoring if some time has passed
-            if cameras[camera_id]['status'] == "incident" and (current_time - last_incident_time > 3):
-                cameras[camera_id]['status'] = "monitoring"
-                cameras[camera_id]['detections'] = []
-        
-        # Update system stats periodically
-        if processed_frames % 10 == 0:
-            update_system_stats()
+            detections = None
+            pipeline_counters.add("framesSkippedStatic")
+        session.process_frame(frame_number, frame, detections)
     
-    # Make sure to release the video writer if it's still open
-    if output_writer is not None and output_writer.isOpened():
-        output_writer.release()
+    def on_stop():
+        if session is not None:
+            session.close()
     
-    # Release the video
-    cap.release()
-    logger.info(f"Finished processing video. Processed {processed_frames} frames out of {total_frames} total frames.")
+    # Adapts the sampling interval to keep alerts within the latency budget
+    governor = LatencyGovernor(latency_budget=STREAM_LATENCY_BUDGET_MS / 1000,
+                               initial_interval=STREAM_INITIAL_INTERVAL)
+    
+    return CameraStream(camera_id, source, process_frame,
+                        on_status=set_camera_status, on_stop=on_stop,
+                        governor=governor, pool_slots=3 if FRAME_POOL_SLOTS > 0 else 0, **options)
+
+# Background pool encoding incident clips
+clip_encoder = ClipEncoder(max_workers=CLIP_ENCODER_WORKERS)
+
+# Worker processes for sharded videos (see get_shard_pool)
+shard_pool = None
+shard_pool_lock = threading.Lock()
+
+# Running live camera workers, at most one per camera
+stream_manager = StreamManager(create_camera_stream)
 
-def update_system_stats():
-    """Update system statistics"""
+# Bounded pool of workers processing queued videos
+job_manager = JobManager(max_workers=MAX_WORKERS, max_queue_size=MAX_QUEUED_JOBS,
+                         state_path=JOB_STATE_PATH)
+job_manager.register("process-video", run_video_job)
+
+# Numeric metrics recorded in the stats time series
+STATS_FIELDS = (
+    "cpu_usage", "memory_usage", "storage_used_gb", "storage_total_gb", "storage_percentage",
+    "network_mbps", "network_load", "decode_fps", "inference_fps", "static_skip_fps", "jobs_queued", "jobs_running",
+    "streams_active", "max_stream_lag_ms", "clip_backlog"
+)
+
+system_metrics = SystemMetricsReader([UPLOAD_FOLDER, PROCESSED_FOLDER, os.path.dirname(INCIDENT_DB_PATH)])
+
+def sample_system_stats():
+    """Read current host and pipeline metrics for the stats time series"""
+    values = system_metrics.read()
+    
+    rates = pipeline_counters.rates()
+    values["decode_fps"] = rates.get("framesDecoded", 0.0)
+    values["inference_fps"] = rates.get("framesInferred", 0.0)
+    values["static_skip_fps"] = rates.get("framesSkippedStatic", 0.0)
+    
+    jobs = job_manager.stats()
+    values["jobs_queued"] = jobs["queued"]
+    values["jobs_running"] = jobs["running"]
+    
+    streams = stream_manager.stats()
+    lags = [s["governor"]["lagMs"] for s in streams if s.get("governor") and s["governor"]["lagMs"] is not None]
+    values["streams_active"] = sum(1 for s in streams if s["status"] == "monitoring")
+    values["max_stream_lag_ms"] = max(lags) if lags else 0.0
+    
+    values["clip_backlog"] = clip_encoder.stats()["pending"]
+    return values
+
+def update_system_stats(values):
+    """Publish a new metrics sample as the current system state"""
     global system_state
+    # Built on a copy and swapped in, so API handlers never see a half-updated state
+    state = dict(system_state)
+    
+    # Host metrics, in the format the dashboard expects
+    for key in ("cpu_usage", "memory_usage", "storage_percentage", "network_load"):
+        if key in values:
+            state[key] = round(values[key], 1)
+    if "storage_total_gb" in values:
+        state["storage_used"] = f"{values['storage_used_gb']:.1f} GB"
+        state["storage_total"] = f"{values['storage_total_gb']:.1f} GB"
+    if "network_mbps" in values:
+        state["network_speed"] = f"{values['network_mbps']:.1f} Mbps"
     
-    # In a real system, we would get actual system metrics
-    # For demonstration, we'll simulate changing values
-    system_state["cpu_usage"] = min(95, max(5, system_state["cpu_usage"] + random.uniform(-5, 5)))
-    system_state["memory_usage"] = min(95, max(20, system_state["memory_usage"] + random.uniform(-3, 3)))
+    # Processing pipeline
+    streams = stream_manager.stats()
+    state["pipeline"] = {
+        "decodeFps": round(values["decode_fps"], 2),
+        "inferenceFps": round(values["inference_fps"], 2),
+        "staticSkipFps": round(values["static_skip_fps"], 2),
+        "jobs": job_manager.stats(),
+        "streams": {
+            s["cameraId"]: {
+                "status": s["status"],
+                "lagMs": s["governor"]["lagMs"] if s.get("governor") else s["lastFrameAgeMs"],
+                "processedFps": s["governor"]["processedFps"] if s.get("governor") else None
+            }
+            for s in streams
+        }
+    }
     
-    # Simulate storage
-    used_gb = float(system_state["storage_used"].split()[0])
-    total_gb = float(system_state["storage_total"].split()[0])
-    used_gb = min(total_gb, max(0.1, used_gb + random.uniform(-0.1, 0.2)))
-    system_state["storage_used"] = f"{used_gb:.1f} GB"
-    system_state["storage_percentage"] = (used_gb / total_gb) * 100
+    # Loaded models
+    state["models"] = model_registry.stats()
     
-    # Network metrics
-    system_state["network_speed"] = f"{random.randint(10, 200)} Mbps"
-    system_state["network_load"] = min(100, max(0, system_state["network_load"] + random.uniform(-10, 10)))
+    # Incident clips waiting to be encoded
+    state["clipEncoder"] = clip_encoder.stats()
+    
+    # Connected push clients
+    state["events"] = event_broker.stats()
     
     # Update timestamp
-    system_state["last_updated"] = datetime.now().isoformat()
+    state["last_updated"] = datetime.now().isoformat()
+    
+    system_state = state
+    event_broker.publish("stats-updated", state)
 
-# Start a background thread to periodically update system stats
-def system_stats_updater():
-    while True:
-        update_system_stats()
-        time.sleep(5)  # Update every 5 seconds
+# Samples metrics on a fixed schedule and keeps their history
+metrics_collector = MetricsCollector(
+    STATS_FIELDS, sample_system_stats,
+    interval=STATS_INTERVAL_SECONDS,
+    raw_capacity=STATS_HISTORY_SAMPLES,
+    rollup_every=STATS_ROLLUP_SAMPLES,
+    rollup_capacity=STATS_ROLLUP_HISTORY,
+    on_sample=update_system_stats
+)
 
 # Routes
 @app.route('/api/status', methods=['GET'])
@@ -293,9 +599,52 @@ def get_status():
 def get_system_stats():
     return jsonify(system_state)
 
+@app.route('/api/system-stats/history', methods=['GET'])
+def get_system_stats_history():
+    """
+    Time series of recorded metrics
+
+    Query parameters:
+        resolution: raw (every sample, default) or rollup (downsampled averages)
+        fields: Comma-separated metrics to include (default all)
+        last: Only the newest N samples
+    """
+    resolution = request.args.get('resolution', 'raw')
+    if resolution not in ('raw', 'rollup'):
+        return jsonify({"error": "resolution must be raw or rollup"}), 400
+    last = request.args.get('last', type=int)
+    series = metrics_collector.history(resolution, split_param('fields') or None, last)
+    interval = STATS_INTERVAL_SECONDS * (STATS_ROLLUP_SAMPLES if resolution == 'rollup' else 1)
+    return jsonify({"resolution": resolution, "intervalSeconds": round(interval, 3), "series": series})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Per-stage latency histograms and the latest system metrics in Prometheus text format"""
+    return Response(render_prometheus(metrics_collector.latest()),
+                    mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/models', methods=['GET'])
+def get_models():
+    return jsonify(model_registry.stats())
+
+@app.route('/api/events', methods=['GET'])
+def get_events():
+    """
+    Server-Sent-Events push of incident-created, camera-status-changed and
+    stats-updated events (?types= filters them). A "resync" event means
+    events were missed and the client should refetch.
+    """
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('lastEventId'))
+    sub = event_broker.subscribe(
+        types=split_param('types') or None,
+        last_event_id=int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    )
+    return Response(event_broker.stream(sub), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/cameras', methods=['GET'])
 def get_cameras():
-    return jsonify(list(cameras.values()))
+    return jsonify(cameras.snapshot())
 
 @app.route('/api/cameras/<camera_id>', methods=['GET'])
 def get_camera(camera_id):
@@ -303,16 +652,90 @@ def get_camera(camera_id):
         return jsonify(cameras[camera_id])
     return jsonify({"error": "Camera not found"}), 404
 
+@app.route('/api/cameras/<camera_id>/roi', methods=['PUT'])
+def update_camera_roi(camera_id):
+    """
+    Set a camera's region of interest: {"roi": [[x, y], ...]} with coordinates
+    as fractions of the frame size, or {"roi": null} to use the whole frame
+    """
+    if camera_id not in cameras:
+        return jsonify({"error": "Camera not found"}), 404
+    
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or 'roi' not in body:
+        return jsonify({"error": "Expected a JSON body with an roi field"}), 400
+    try:
+        set_camera_roi(camera_id, body['roi'])
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(cameras[camera_id])
+
+@app.route('/api/cameras/<camera_id>/stream', methods=['POST'])
+def start_camera_stream(camera_id):
+    """Start ingesting a live feed for a camera (any OpenCV video source)"""
+    if camera_id not in cameras:
+        return jsonify({"error": "Camera not found"}), 404
+    
+    body = request.get_json(silent=True) or {}
+    stream_url = body.get('streamUrl') or cameras[camera_id].get('streamUrl')
+    if not stream_url:
+        return jsonify({"error": "No streamUrl given"}), 400
+    
+    update_camera(camera_id, streamUrl=stream_url)
+    stream = stream_manager.start(camera_id, stream_url, loop=bool(body.get('loop', False)))
+    return jsonify(stream.stats()), 201
+
+@app.route('/api/cameras/<camera_id>/stream', methods=['DELETE'])
+def stop_camera_stream(camera_id):
+    if not stream_manager.stop(camera_id):
+        return jsonify({"error": "No stream running for camera"}), 404
+    return jsonify({"message": f"Stream for camera {camera_id} stopped"})
+
+@app.route('/api/streams', methods=['GET'])
+def get_streams():
+    return jsonify(stream_manager.stats())
+
+def split_param(name):
+    """Comma separated (or repeated) query parameter as a list"""
+    return [v for value in request.args.getlist(name) for v in value.split(',') if v]
+
 @app.route('/api/incidents', methods=['GET'])
 def get_incidents():
-    return jsonify(incidents)
+    """
+    Incidents, newest first, one page at a time
+    
+    Query parameters: limit, cursor (from the X-Next-Cursor header of the
+    previous page), since=<id> (only newer incidents, oldest first; the
+    next page continues with since=<X-Next-Cursor>),
+    cameraId, type, severity (comma separated), from/to (ISO timestamps)
+    and fields (comma separated projection).
+    """
+    page, next_cursor = incident_store.query(
+        limit=request.args.get('limit', INCIDENTS_PAGE_SIZE, type=int),
+        cursor=request.args.get('cursor', type=int),
+        since=request.args.get('since', type=int),
+        camera_ids=split_param('cameraId'),
+        types=split_param('type'),
+        severities=split_param('severity'),
+        start=request.args.get('from'),
+        end=request.args.get('to'),
+        fields=split_param('fields') or None
+    )
+    response = jsonify(page)
+    # The body stays a plain array; paging information travels in headers
+    if next_cursor is not None:
+        args = request.args.to_dict(flat=False)
+        args['since' if 'since' in args else 'cursor'] = [str(next_cursor)]
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+        response.headers['Link'] = f'<{request.path}?{urlencode(args, doseq=True)}>; rel="next"'
+    return response
 
 @app.route('/api/incidents/<incident_id>', methods=['GET'])
 def get_incident(incident_id):
-    for incident in incidents:
-        if incident['id'] == incident_id:
-            return jsonify(incident)
-    return jsonify({"error": "Incident not found"}), 404
+    incident = incident_store.get(int(incident_id)) if incident_id.isdigit() else None
+    if incident is None:
+        return jsonify({"error": "Incident not found"}), 404
+    return jsonify(incident)
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
@@ -321,27 +744,86 @@ def upload_file():
     
     file = request.files['file']
     camera_id = request.form.get('cameraId', 'cam1')  # Default to cam1 if not specified
+    if camera_id not in cameras:
+        return jsonify({"error": "Camera not found"}), 404
     
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
     
     if file and allowed_file(file.filename):
+        # Reject early so we don't store uploads we can't process
+        if job_manager.is_full():
+            return queue_full_response()
+
         filename = f"{int(time.time())}_{file.filename}"
         filepath = os.path.join(UPLOAD_FOLDER, filename)
         file.save(filepath)
         
-        # Process the video in a separate thread
-        threading.Thread(target=process_video, args=(filepath, camera_id)).start()
+        # Queue the video for processing by the worker pool
+        priority = request.form.get('priority', 0, type=int)
+        try:
+            job = job_manager.submit("process-video", {"video_path": filepath, "camera_id": camera_id}, priority)
+        except JobQueueFull:
+            os.remove(filepath)
+            return queue_full_response()
         
         return jsonify({
             "message": "File uploaded successfully",
             "filename": filename,
             "path": filepath,
-            "cameraId": camera_id
+            "cameraId": camera_id,
+            "jobId": job.id,
+            "jobUrl": f"/api/jobs/{job.id}"
         })
     
     return jsonify({"error": "File type not allowed"}), 400
 
+def queue_full_response():
+    response = jsonify({"error": "Processing queue is full, try again later", "queue": job_manager.stats()})
+    response.headers['Retry-After'] = '30'
+    return response, 429
+
+@app.route('/api/jobs', methods=['GET'])
+def get_jobs():
+    return jsonify({"jobs": job_manager.list(), "queue": job_manager.stats()})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    # Long-poll: ?wait=<seconds>&since=<version> holds the request until the job changes
+    wait = min(request.args.get('wait', 0, type=float), MAX_LONG_POLL_SECONDS)
+    if wait > 0:
+        job = job_manager.wait(job_id, request.args.get('since', -1, type=int), wait)
+    else:
+        job = job_manager.snapshot(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def get_job_events(job_id):
+    """Server-Sent-Events stream of job progress, closed once the job finishes"""
+    job = job_manager.snapshot(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def stream():
+        version = -1
+        while True:
+            job = job_manager.wait(job_id, version, MAX_LONG_POLL_SECONDS)
+            if job is None:
+                return
+            if job['version'] == version:
+                # Keep idle connections alive through proxies
+                yield ": keep-alive\n\n"
+                continue
+            version = job['version']
+            yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
+            if job['status'] in ('completed', 'failed'):
+                return
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/videos', methods=['GET'])
 def get_videos():
     videos = []
@@ -363,36 +845,59 @@ def processed_file(filename):
 
 @app.route('/api/process-video/<filename>', methods=['POST'])
 def process_video_endpoint(filename):
-    """Endpoint to process a specific uploaded video with AI detection"""
+    """Endpoint to queue processing of a specific uploaded video with AI detection"""
     video_path = os.path.join(UPLOAD_FOLDER, filename)
     
     # Check if file exists
     if not os.path.isfile(video_path):
         return jsonify({"error": f"Video file {filename} not found"}), 404
     
-    # Get camera ID from request or use default
-    camera_id = request.json.get('cameraId', 'cam1') if request.json else 'cam1'
+    # Get camera ID and priority from request or use defaults
+    body = request.get_json(silent=True) or {}
+    camera_id = body.get('cameraId', 'cam1')
+    if camera_id not in cameras:
+        return jsonify({"error": "Camera not found"}), 404
+    priority = body.get('priority', 0)
+    if not isinstance(priority, int) or isinstance(priority, bool):
+        return jsonify({"error": "priority must be an integer"}), 400
     
-    # Get the number of incidents before processing
-    incidents_before = len(incidents)
-    
-    # Process the video in a blocking manner for this endpoint
-    # (this is okay for the user-initiated processing, but would be bad for streaming)
-    process_video(video_path, camera_id)
-    
-    # Calculate how many new incidents were detected
-    incidents_after = len(incidents)
-    incidents_detected = incidents_after - incidents_before
+    # Hand the video to the worker pool and return immediately; progress is
+    # available from the job endpoints below
+    try:
+        job = job_manager.submit("process-video", {"video_path": video_path, "camera_id": camera_id}, priority)
+    except JobQueueFull:
+        return queue_full_response()
     
     return jsonify({
-        "message": f"Video {filename} processed successfully",
-        "incidentsDetected": incidents_detected,
+        "message": f"Video {filename} queued for processing",
+        "jobId": job.id,
+        "statusUrl": f"/api/jobs/{job.id}",
+        "eventsUrl": f"/api/jobs/{job.id}/events",
         "camera": cameras[camera_id]
-    })
+    }), 202
+
+def start_services():
+    """Start the server's background services"""
+    # Start sampling system metrics
+    metrics_collector.start()
+
+    # Load and warm up the detection model before the first job needs it
+    model_registry.warm_up(MODEL_NAME, **MODEL_CONFIG)
+
+    # Start the video processing workers
+    job_manager.start()
+
+    # Apply regions of interest configured in the environment
+    for roi_camera_id, polygon in (json.loads(CAMERA_ROIS) if CAMERA_ROIS else {}).items():
+        if roi_camera_id in cameras:
+            set_camera_roi(roi_camera_id, polygon)
 
-# Start the background thread for system stats updates
-stats_thread = threading.Thread(target=system_stats_updater, daemon=True)
-stats_thread.start()
+    # Start any live camera feeds configured in the environment
+    for entry in filter(None, CAMERA_STREAMS.split(',')):
+        stream_camera_id, _, stream_url = entry.partition('=')
+        if stream_camera_id in cameras and stream_url:
+            update_camera(stream_camera_id, streamUrl=stream_url)
+            stream_manager.start(stream_camera_id, stream_url)
 
 @app.route('/')
 def home():
@@ -403,5 +908,9 @@ def health():
 
 
 if __name__ == '__main__':
+    # In debug mode the reloader re-runs this script in a child process that
+    # does the serving; only that one starts the services
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_services()
     port = int(os.environ.get('PORT', 5001))
     app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
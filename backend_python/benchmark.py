@@ -0,0 +1,316 @@
+"""
+Benchmark harness for the detection pipeline.
+
+Synthesizes test videos, then measures the pipeline end to end
+(process_video) and each stage on its own (frame reads, Letterbox
+preprocessing, YOLOv8Simulator.predict / predict_batch,
+AccidentDetector.detect and annotate_frame). Every case runs in a fresh
+process so peak RSS is per case, and all randomness is seeded so runs
+are comparable.
+
+Usage:
+    python benchmark.py --output results.json
+    python benchmark.py --resolutions 1280x720 --seconds 30 --compare results.json
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Sequence
+
+import cv2
+import numpy as np
+
+from models.yolo_sim import ACCIDENT_RATE, LATENCY_MODELS
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_RESOLUTIONS = "640x360,1280x720,1920x1080"
+DEFAULT_FPS = "25"
+DEFAULT_SECONDS = "10"
+DEFAULT_STAGE_FRAMES = 50
+DEFAULT_TOLERANCE = 0.1
+
+
+def synthesize_video(path: str, width: int, height: int, fps: float, seconds: float, seed: int = 0):
+    """
+    Write a synthetic traffic-like video: a static gradient background with
+    a few rectangles moving across it at constant speeds
+
+    Args:
+        path: Output video path
+        width: Frame width
+        height: Frame height
+        fps: Frame rate
+        seconds: Duration
+        seed: Seed for object sizes, colors and speeds
+    """
+    rng = np.random.default_rng(seed)
+    background = np.empty((height, width, 3), dtype=np.uint8)
+    background[:] = np.linspace(40, 120, width, dtype=np.uint8)[None, :, None]
+
+    count = 6
+    sizes = rng.integers(min(width, height) // 12, min(width, height) // 5, size=(count, 2))
+    colors = rng.integers(0, 256, size=(count, 3))
+    starts = rng.uniform(0, 1, size=(count, 2)) * (width, height)
+    velocities = rng.uniform(-1, 1, size=(count, 2)) * (width, height) / (2 * fps)
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise IOError(f"Unable to write video: {path}")
+    frame = np.empty_like(background)
+    try:
+        for i in range(int(round(fps * seconds))):
+            np.copyto(frame, background)
+            positions = (starts + velocities * i) % (width, height)
+            for (x, y), (w, h), color in zip(positions.astype(int), sizes, colors):
+                cv2.rectangle(frame, (int(x), int(y)), (int(x + w), int(y + h)), tuple(int(c) for c in color), -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+
+
+def latency_stats(samples: Sequence[float], frames: int) -> Dict[str, Any]:
+    """Throughput and per-frame latency percentiles of timed calls handling `frames` frames in total"""
+    seconds = np.asarray(samples, dtype=np.float64)
+    per_frame = seconds * len(seconds) / max(1, frames)
+    total = float(seconds.sum())
+    p50, p95, p99 = np.percentile(per_frame, [50, 95, 99]) if len(per_frame) else (0.0, 0.0, 0.0)
+    return {
+        "calls": len(seconds),
+        "frames": frames,
+        "seconds": round(total, 4),
+        "fps": round(frames / total, 2) if total > 0 else None,
+        "p50Ms": round(1000 * p50, 3),
+        "p95Ms": round(1000 * p95, 3),
+        "p99Ms": round(1000 * p99, 3)
+    }
+
+
+def time_calls(fn: Callable[[Any], Any], inputs: Sequence[Any]) -> List[float]:
+    samples = []
+    for item in inputs:
+        start = time.perf_counter()
+        fn(item)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def read_frames(path: str, limit: int) -> List[np.ndarray]:
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def benchmark_stages(video_path: str, stage_frames: int, batch_size: int,
+                     model_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Time each stage in isolation on the first stage_frames frames of the video"""
+    from models.detector import AccidentDetector
+    from models.preprocess import Letterbox
+    from models.registry import get_model
+
+    results = {}
+
+    cap = cv2.VideoCapture(video_path)
+    samples = []
+    while len(samples) < stage_frames:
+        start = time.perf_counter()
+        ret, _ = cap.read()
+        if not ret:
+            break
+        samples.append(time.perf_counter() - start)
+    cap.release()
+    results["read"] = latency_stats(samples, len(samples))
+
+    frames = read_frames(video_path, stage_frames)
+    model = get_model("yolov8n.pt", **model_config)
+    detector = AccidentDetector("yolov8n.pt", **model_config)
+
+    results["predict"] = latency_stats(time_calls(model.predict, frames), len(frames))
+
+    batches = [np.stack(frames[i:i + batch_size]) for i in range(0, len(frames), batch_size)]
+    letterbox = Letterbox()
+    results["letterbox"] = latency_stats(time_calls(letterbox.prepare, batches), len(frames))
+    results["predictBatch"] = latency_stats(time_calls(model.predict_batch, batches), len(frames))
+
+    results["detect"] = latency_stats(time_calls(detector.detect, frames), len(frames))
+
+    detections = model.predict_batch(frames)
+    pairs = list(zip(frames, detections))
+    results["annotateFrame"] = latency_stats(time_calls(lambda p: model.annotate_frame(*p), pairs), len(pairs))
+
+    return results
+
+
+def benchmark_end_to_end(video_path: str) -> Dict[str, Any]:
+    """Run process_video on the video, as an uploaded video job would"""
+    import app
+
+    start = time.perf_counter()
+    summary = app.process_video(video_path, "cam1")
+    app.clip_encoder.shutdown(wait=True)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "seconds": round(elapsed, 4),
+        "framesDecoded": summary["framesDecoded"],
+        "framesInferred": summary["framesInferred"],
+        "decodeFps": round(summary["framesDecoded"] / elapsed, 2),
+        "inferenceFps": round(summary["framesInferred"] / elapsed, 2),
+        "incidents": summary["incidentsFound"],
+        "incidentsPerSecond": round(summary["incidentsFound"] / elapsed, 4),
+        "stages": summary["stages"]
+    }
+
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one benchmark case; called in a fresh process"""
+    # Keep the app's data folders and incident database out of the real ones
+    os.chdir(case["workDir"])
+    sys.path.insert(0, BACKEND_DIR)
+    # Model loading prints progress; keep stdout for the JSON results
+    sys.stdout = sys.stderr
+    random.seed(case["seed"])
+    np.random.seed(case["seed"])
+    # Read by app.py when the end-to-end run imports it
+    os.environ["SIMULATOR_SEED"] = str(case["seed"])
+    os.environ["SIMULATOR_LATENCY"] = case["latency"]
+    os.environ["SIMULATOR_ACCIDENT_RATE"] = str(case["accidentRate"])
+    model_config = {"seed": case["seed"], "latency": case["latency"], "accident_rate": case["accidentRate"]}
+
+    video_path = os.path.join(case["workDir"], "input.mp4")
+    synthesize_video(video_path, case["width"], case["height"], case["fps"], case["seconds"], case["seed"])
+
+    result = {"name": case["name"], "width": case["width"], "height": case["height"],
+              "fps": case["fps"], "seconds": case["seconds"]}
+    if case["stages"]:
+        result["stages"] = benchmark_stages(video_path, case["stageFrames"], case["batchSize"], model_config)
+    if case["endToEnd"]:
+        result["endToEnd"] = benchmark_end_to_end(video_path)
+    # ru_maxrss is in KiB on Linux
+    result["peakRssMb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+
+def build_cases(args) -> List[Dict[str, Any]]:
+    cases = []
+    resolutions = [tuple(int(v) for v in r.split("x")) for r in args.resolutions.split(",")]
+    for (width, height), fps, seconds in itertools.product(
+            resolutions, [float(v) for v in args.fps.split(",")], [float(v) for v in args.seconds.split(",")]):
+        cases.append({
+            "name": f"{width}x{height}@{fps:g}fps-{seconds:g}s",
+            "width": width,
+            "height": height,
+            "fps": fps,
+            "seconds": seconds,
+            "seed": args.seed,
+            "latency": args.latency,
+            "accidentRate": args.accident_rate,
+            "stageFrames": args.stage_frames,
+            "batchSize": args.batch_size,
+            "stages": not args.end_to_end_only,
+            "endToEnd": not args.stages_only
+        })
+    return cases
+
+
+def throughput_metrics(result: Dict[str, Any]) -> Dict[str, float]:
+    """Higher-is-better figures of a case result, keyed by a stable name"""
+    metrics = {}
+    for stage, stats in result.get("stages", {}).items():
+        if stats.get("fps"):
+            metrics[f"stages.{stage}.fps"] = stats["fps"]
+    if "endToEnd" in result:
+        metrics["endToEnd.decodeFps"] = result["endToEnd"]["decodeFps"]
+        metrics["endToEnd.inferenceFps"] = result["endToEnd"]["inferenceFps"]
+    return metrics
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print throughput changes against a baseline to stderr; returns the regressions beyond tolerance"""
+    regressions = []
+    baseline_cases = {case["name"]: case for case in baseline.get("cases", [])}
+    for case in results["cases"]:
+        before = baseline_cases.get(case["name"])
+        if before is None:
+            continue
+        old = throughput_metrics(before)
+        for metric, value in throughput_metrics(case).items():
+            if not old.get(metric):
+                continue
+            change = value / old[metric] - 1
+            line = f"{case['name']:<28} {metric:<28} {old[metric]:>10.2f} -> {value:>10.2f} ({change:+.1%})"
+            print(line, file=sys.stderr)
+            if change < -tolerance:
+                regressions.append(line)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the accident detection pipeline")
+    parser.add_argument("--resolutions", default=DEFAULT_RESOLUTIONS, help="Comma-separated WIDTHxHEIGHT list")
+    parser.add_argument("--fps", default=DEFAULT_FPS, help="Comma-separated frame rates")
+    parser.add_argument("--seconds", default=DEFAULT_SECONDS, help="Comma-separated video lengths")
+    parser.add_argument("--stage-frames", type=int, default=DEFAULT_STAGE_FRAMES, help="Frames timed per stage benchmark")
+    parser.add_argument("--batch-size", type=int, default=4, help="Batch size for predictBatch")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", default="sleep", choices=LATENCY_MODELS, help="Simulated inference cost model")
+    parser.add_argument("--accident-rate", type=float, default=ACCIDENT_RATE, help="Simulated accidents per frame")
+    parser.add_argument("--stages-only", action="store_true", help="Skip the end-to-end runs")
+    parser.add_argument("--end-to-end-only", action="store_true", help="Skip the per-stage runs")
+    parser.add_argument("--output", help="Write results as JSON to this file (default stdout)")
+    parser.add_argument("--compare", help="Baseline results JSON to compare throughput against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Throughput drop (fraction) reported as a regression; exits 1 if any")
+    args = parser.parse_args(argv)
+
+    results = {
+        "createdAt": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "cpuCount": os.cpu_count(),
+        "seed": args.seed,
+        "latency": args.latency,
+        "accidentRate": args.accident_rate,
+        "cases": []
+    }
+    ctx = multiprocessing.get_context("spawn")
+    for case in build_cases(args):
+        print(f"Running {case['name']}...", file=sys.stderr)
+        with tempfile.TemporaryDirectory(prefix="accident-bench-") as work_dir:
+            case["workDir"] = work_dir
+            with ctx.Pool(1) as pool:
+                results["cases"].append(pool.apply(run_case, (case,)))
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
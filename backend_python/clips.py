@@ -0,0 +1,140 @@
+import cv2
+import numpy as np
+import threading
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence
+
+from metrics import StageTimer
+
+logger = logging.getLogger(__name__)
+
+
+class FrameRingBuffer:
+    """
+    Fixed-memory buffer of the most recent frames.
+
+    Frames are copied into a single preallocated capacity x H x W x 3 array
+    (allocated on the first push, once the frame size is known), so keeping
+    a rolling window of history costs no allocation per frame. Each slot
+    also records the frame's video time and an arbitrary metadata object.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._frames: Optional[np.ndarray] = None
+        self._times = np.zeros(self.capacity, dtype=np.float64)
+        self._meta: List[Any] = [None] * self.capacity
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def push(self, frame: np.ndarray, video_time: float, meta: Any = None):
+        if self._frames is None or self._frames.shape[1:] != frame.shape:
+            # First frame, or the source changed resolution (e.g. a reconnected stream)
+            self._frames = np.empty((self.capacity,) + frame.shape, dtype=frame.dtype)
+            self._next = 0
+            self._count = 0
+        np.copyto(self._frames[self._next], frame)
+        self._times[self._next] = video_time
+        self._meta[self._next] = meta
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def window(self, start_time: float, end_time: float):
+        """
+        Copy out the buffered frames with start_time <= video time <= end_time
+
+        Returns:
+            (frames, times, metas) in chronological order; frames is an N x H x W x 3 array
+        """
+        if self._count == 0:
+            return np.empty((0,)), np.empty((0,)), []
+        first = (self._next - self._count) % self.capacity
+        order = (first + np.arange(self._count)) % self.capacity
+        times = self._times[order]
+        selected = order[(times >= start_time) & (times <= end_time)]
+        return self._frames[selected], self._times[selected], [self._meta[i] for i in selected]
+
+
+class ClipEncoder:
+    """
+    Background pool that encodes incident clips so VideoWriter setup and
+    encoding never stall the detection loop.
+    """
+
+    def __init__(self, max_workers: int = 2, fourcc: str = 'mp4v'):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="clip-encoder")
+        self._fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.clips_written = 0
+        self.clips_failed = 0
+
+    def submit(self, path: str, frames: np.ndarray, fps: float,
+               metas: Sequence[Any] = (), render: Optional[Callable[[np.ndarray, Any], np.ndarray]] = None,
+               timer: Optional[StageTimer] = None) -> Future:
+        """
+        Queue a clip for encoding
+
+        Args:
+            path: Output video path
+            frames: N x H x W x 3 frames, owned by the encoder from now on
+            fps: Playback frame rate of the clip
+            metas: Per-frame metadata passed to render
+            render: Optional render(frame, meta) -> frame applied before writing (e.g. annotation)
+            timer: Records render and VideoWriter.write times as the "annotate" and "video_write" stages
+        """
+        with self._lock:
+            self.pending += 1
+        return self._executor.submit(self._encode, path, frames, fps, list(metas), render, timer)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self.pending,
+                "clipsWritten": self.clips_written,
+                "clipsFailed": self.clips_failed
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def _encode(self, path, frames, fps, metas, render, timer):
+        ok = False
+        try:
+            if len(frames) == 0:
+                return False
+            height, width = frames.shape[1:3]
+            writer = cv2.VideoWriter(path, self._fourcc, max(1.0, fps), (width, height))
+            if not writer.isOpened():
+                logger.error(f"Error opening clip writer: {path}")
+                return False
+            try:
+                timer = timer or StageTimer()
+                for i, frame in enumerate(frames):
+                    if render is not None:
+                        start = time.perf_counter()
+                        frame = render(frame, metas[i] if i < len(metas) else None)
+                        timer.observe("annotate", time.perf_counter() - start)
+                    start = time.perf_counter()
+                    writer.write(frame)
+                    timer.observe("video_write", time.perf_counter() - start)
+            finally:
+                writer.release()
+            ok = True
+            logger.info(f"Saved incident clip: {path}")
+            return True
+        except Exception:
+            logger.exception(f"Error encoding clip: {path}")
+            return False
+        finally:
+            with self._lock:
+                self.pending -= 1
+                if ok:
+                    self.clips_written += 1
+                else:
+                    self.clips_failed += 1
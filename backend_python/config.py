@@ -0,0 +1,59 @@
+import os
+from dotenv import load_dotenv
+
+from video_source import SAMPLING_AUTO
+
+# Settings are read from the environment (and a .env file) once, on import.
+# They live apart from app.py so the shard worker processes can read them
+# without importing the server.
+load_dotenv()
+
+UPLOAD_FOLDER = 'data/uploads/videos'
+PROCESSED_FOLDER = 'data/processed/videos'
+MODEL_PATH = 'backend_python/models'
+ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov'}
+MODEL_NAME = os.environ.get('MODEL_NAME', 'yolov8n.pt')
+# Simulated model behaviour (see models/yolo_sim.py); a seed makes detections reproducible
+MODEL_CONFIG = {
+    "seed": int(os.environ['SIMULATOR_SEED']) if os.environ.get('SIMULATOR_SEED') else None,
+    "latency": os.environ.get('SIMULATOR_LATENCY', 'sleep'),  # sleep, cpu, proportional or none
+    "accident_rate": float(os.environ.get('SIMULATOR_ACCIDENT_RATE', 0.02))
+}
+JOB_STATE_PATH = 'data/jobs.json'
+INCIDENT_DB_PATH = 'data/incidents.db'
+INCIDENTS_PAGE_SIZE = 50  # Default page size of /api/incidents
+EVENT_CLIENT_BUFFER = 100  # Events buffered per /api/events client before it is dropped
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', 2))  # Videos processed concurrently
+MAX_QUEUED_JOBS = int(os.environ.get('MAX_QUEUED_JOBS', 100))  # Uploads waiting beyond this get a 429
+INFERENCE_BATCH_SIZE = int(os.environ.get('INFERENCE_BATCH_SIZE', 4))  # Sampled frames per model call
+VIDEO_SHARDS = int(os.environ.get('VIDEO_SHARDS', 1))  # Processes a long video is split across (1 = no splitting)
+VIDEO_SHARD_MIN_SECONDS = float(os.environ.get('VIDEO_SHARD_MIN_SECONDS', 600))  # Shortest time range worth a shard
+VIDEO_SHARD_WORKERS = int(os.environ.get('VIDEO_SHARD_WORKERS', os.cpu_count() or 1))  # Shard worker processes
+MODEL_INPUT_SIZE = int(os.environ.get('MODEL_INPUT_SIZE', 640))  # Frames are letterboxed to this square (0 = native resolution)
+SAMPLING_MODE = os.environ.get('SAMPLING_MODE', SAMPLING_AUTO)  # grab, seek or auto (see video_source.py)
+DECODE_QUEUE_DEPTH = int(os.environ.get('DECODE_QUEUE_DEPTH', 4))  # Decoded batches waiting for inference
+INFERENCE_QUEUE_DEPTH = int(os.environ.get('INFERENCE_QUEUE_DEPTH', 4))  # Inferred batches waiting to be annotated/encoded
+FRAME_POOL_SLOTS = int(os.environ.get('FRAME_POOL_SLOTS', 8))  # Decoded batches in flight per video; decode waits beyond this (0 = no pool)
+MAX_LONG_POLL_SECONDS = 25  # Stay below the Node proxy timeout
+CLIP_PRE_ROLL_SECONDS = float(os.environ.get('CLIP_PRE_ROLL_SECONDS', 3))  # Video kept from before an incident
+CLIP_POST_ROLL_SECONDS = float(os.environ.get('CLIP_POST_ROLL_SECONDS', 3))  # Video kept from after an incident
+CLIP_MAX_BUFFER_FRAMES = int(os.environ.get('CLIP_MAX_BUFFER_FRAMES', 64))  # Caps ring buffer memory per camera
+CLIP_ENCODER_WORKERS = int(os.environ.get('CLIP_ENCODER_WORKERS', 2))
+# Live feeds started at boot, e.g. "cam1=rtsp://host/stream,cam2=/videos/loop.mp4"
+CAMERA_STREAMS = os.environ.get('CAMERA_STREAMS', '')
+# Regions of interest set at boot, as JSON: {"cam1": [[0.1, 0.5], [0.9, 0.5], [0.9, 1], [0.1, 1]]}
+CAMERA_ROIS = os.environ.get('CAMERA_ROIS', '')
+STREAM_LATENCY_BUDGET_MS = float(os.environ.get('STREAM_LATENCY_BUDGET_MS', 500))  # Max frame age on live feeds
+STREAM_INITIAL_INTERVAL = int(os.environ.get('STREAM_INITIAL_INTERVAL', 6))  # Starting frames per sample, adapted live
+INCIDENT_CONFIRM_FRAMES = int(os.environ.get('INCIDENT_CONFIRM_FRAMES', 3))  # Accident must be seen in N...
+INCIDENT_CONFIRM_WINDOW = int(os.environ.get('INCIDENT_CONFIRM_WINDOW', 5))  # ...of the last M processed frames
+TRACK_IOU_THRESHOLD = float(os.environ.get('TRACK_IOU_THRESHOLD', 0.3))  # Box overlap that continues a track
+INCIDENT_MIN_INTERVAL_SECONDS = float(os.environ.get('INCIDENT_MIN_INTERVAL_SECONDS', 5))  # Video time between incidents on a camera
+MOTION_GATE = os.environ.get('MOTION_GATE', 'true').lower() == 'true'  # Skip inference on frames without motion
+MOTION_PIXEL_THRESHOLD = int(os.environ.get('MOTION_PIXEL_THRESHOLD', 25))  # Gray level change that counts a pixel as moving
+MOTION_MIN_CHANGED = float(os.environ.get('MOTION_MIN_CHANGED', 0.005))  # Fraction of moving pixels that triggers inference
+MOTION_MAX_SKIPPED = int(os.environ.get('MOTION_MAX_SKIPPED', 20))  # Still frames in a row before one is inferred anyway
+STATS_INTERVAL_SECONDS = float(os.environ.get('STATS_INTERVAL_SECONDS', 5))  # Metrics sampling period
+STATS_HISTORY_SAMPLES = int(os.environ.get('STATS_HISTORY_SAMPLES', 720))  # Raw samples kept (1 hour at 5 s)
+STATS_ROLLUP_SAMPLES = int(os.environ.get('STATS_ROLLUP_SAMPLES', 12))  # Raw samples averaged per downsampled sample
+STATS_ROLLUP_HISTORY = int(os.environ.get('STATS_ROLLUP_HISTORY', 1440))  # Downsampled samples kept
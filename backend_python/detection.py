@@ -0,0 +1,347 @@
+import os
+import math
+import uuid
+import logging
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from config import (
+    CLIP_MAX_BUFFER_FRAMES, CLIP_POST_ROLL_SECONDS, CLIP_PRE_ROLL_SECONDS, DECODE_QUEUE_DEPTH,
+    FRAME_POOL_SLOTS, INCIDENT_CONFIRM_FRAMES, INCIDENT_CONFIRM_WINDOW, INCIDENT_MIN_INTERVAL_SECONDS,
+    INFERENCE_QUEUE_DEPTH, MODEL_INPUT_SIZE, MOTION_GATE, MOTION_MAX_SKIPPED, MOTION_MIN_CHANGED,
+    MOTION_PIXEL_THRESHOLD, PROCESSED_FOLDER, TRACK_IOU_THRESHOLD
+)
+from models.detections import Detections
+from models.preprocess import Letterbox
+from pipeline import StagedPipeline
+from clips import FrameRingBuffer
+from framepool import FramePool
+from tracking import IoUTracker
+from motion import MotionGate
+from metrics import StageTimer, pipeline_counters
+
+# The detection pipeline shared by the server (app.py) and the video shard
+# workers (shards.py). Nothing here touches the server's state: incidents
+# leave a DetectionSession through raise_incident(), which the server
+# overrides to publish them.
+
+logger = logging.getLogger(__name__)
+
+
+def create_letterbox():
+    """Model input preprocessing for one video or stream, or None to infer at native resolution"""
+    if MODEL_INPUT_SIZE <= 0:
+        return None
+    return Letterbox((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE))
+
+def detect_in_roi(yolo_model, roi, frames, selected=None, letterbox=None, timer=None, stream=None):
+    """
+    Run the model on a stacked batch of frames, restricted to the ROI
+
+    Args:
+        yolo_model: Model to run
+        roi: RegionOfInterest, or None for the whole frame
+        frames: N x H x W x 3 frames
+        selected: Boolean mask of the frames to run on (default all)
+        letterbox: Letterbox that resizes the inputs for the model, or None for native resolution
+        timer: StageTimer recording the "preprocess" and "predict" stages
+        stream: Object identifying the video the frames come from (see YOLOv8Simulator.predict)
+
+    Returns:
+        One Detections per selected frame, in frame coordinates
+    """
+    timer = timer or StageTimer()
+    # Crop before selecting so only the ROI pixels get copied
+    inputs = roi.crop(frames) if roi is not None else frames
+    if letterbox is not None:
+        # The letterbox reads the selected crops straight into its input batch
+        with timer.measure("preprocess", len(inputs) if selected is None else int(selected.sum())):
+            inputs = letterbox.prepare(inputs, selected)
+        with timer.measure("predict", len(inputs)):
+            results = letterbox.restore(yolo_model.predict_batch(inputs, size=letterbox.size, stream=stream))
+    else:
+        if selected is not None and not selected.all():
+            inputs = inputs[selected]
+        with timer.measure("predict", len(inputs)):
+            results = yolo_model.predict_batch(inputs, stream=stream)
+    if roi is None:
+        return results
+    return [roi.to_frame(detections, frames.shape[1:]) for detections in results]
+
+class DetectionSession:
+    """
+    Incident state for one run of detections on a camera: accident
+    tracking and confirmation, debouncing in video time (so results don't
+    depend on processing speed), incident snapshots and clips.
+
+    Confirmed incidents go to raise_incident(). This base class collects
+    them in self.incidents under provisional file names, which is what a
+    video shard worker needs; the server subclasses it to publish them.
+    """
+
+    def __init__(self, camera_id, yolo_model, fps, clip_encoder, sample_interval=1, timer=None, report_range=None,
+                 min_incident_interval=INCIDENT_MIN_INTERVAL_SECONDS):
+        """
+        Args:
+            camera_id: Camera the detections come from
+            yolo_model: Model producing the detections (used for its classes and annotation)
+            fps: Frame rate of the source, for video time
+            clip_encoder: ClipEncoder writing the incident clips
+            sample_interval: Source frames per processed frame
+            timer: StageTimer for the session's stages
+            report_range: (after, until) frame numbers; only incidents confirmed on frames
+                after < frame <= until are raised, the others just prime the tracker and clip buffer
+            min_incident_interval: Video seconds after an incident during which no other is raised
+        """
+        self.camera_id = camera_id
+        self.model = yolo_model
+        self.clip_encoder = clip_encoder
+        self.timer = timer or StageTimer(camera=camera_id)
+        self.fps = fps if fps and fps > 0 else 25.0
+        # Sampled frames handled, and those of them the model ran on
+        self.processed_frames = 0
+        self.inferred_frames = 0
+        self.incidents_found = 0
+
+        # Accidents are only reported once tracked across several frames
+        self.tracker = IoUTracker(TRACK_IOU_THRESHOLD, INCIDENT_CONFIRM_FRAMES, INCIDENT_CONFIRM_WINDOW)
+
+        # Keep track of when (in video time) we last triggered an incident
+        self.last_incident_time = -math.inf
+        self.min_incident_interval = min_incident_interval
+
+        # Recent sampled frames, so incident clips include the lead-up
+        clip_frames = math.ceil((CLIP_PRE_ROLL_SECONDS + CLIP_POST_ROLL_SECONDS) * self.fps / max(1, sample_interval)) + 1
+        self.ring = FrameRingBuffer(min(CLIP_MAX_BUFFER_FRAMES, clip_frames))
+        # (path, video time of the incident) of the clips waiting for their post-roll, oldest first
+        self.pending_clips = []
+        # Reused for incident snapshots; frames are only annotated when written out
+        self._annotated = None
+        # Detections of the last inferred frame, carried over frames that weren't inferred
+        self.last_detections = Detections.empty(yolo_model.classes)
+
+        self.report_range = report_range
+        # Incidents collected by the default raise_incident(), and their clips being encoded
+        self.incidents = []
+        self.clips = []
+
+    def process_frame(self, frame_count, frame, detections):
+        """
+        Handle the detections for one sampled frame
+
+        Args:
+            frame_count: 1-based frame number in the source
+            frame: The decoded frame
+            detections: Model Detections for the frame, or None if it wasn't inferred
+                (the motion gate found it unchanged)
+        """
+        self.processed_frames += 1
+        video_time = frame_count / self.fps
+        inferred = detections is not None
+        if inferred:
+            self.inferred_frames += 1
+            self.last_detections = detections
+        else:
+            # Nothing moved, so the last detections still describe the scene.
+            # The frame is no evidence either way and stays out of the
+            # tracker, or a still scene could never confirm an accident.
+            detections = self.last_detections
+        self.ring.push(frame, video_time, detections)
+
+        incident_detected = False
+        if inferred:
+            # Track accident detections; an incident is raised when a track is
+            # confirmed, picking the most confident confirmed detection
+            accidents = detections[detections.class_mask(self.model.accident_class_ids)]
+            confirmed = self.tracker.update(accidents.boxes)
+
+            reported = self.report_range is None or self.report_range[0] < frame_count <= self.report_range[1]
+            incident_detected = (reported and len(confirmed) > 0 and
+                                 video_time - self.last_incident_time > self.min_incident_interval)
+
+        if incident_detected:
+            self.last_incident_time = video_time
+            accident = confirmed[np.argmax(accidents.scores[confirmed])]
+
+            # Convert the YOLO detection to our detection format
+            detection = accidents.to_api(accident)
+
+            with self.timer.measure("annotate"):
+                snapshot = self._annotate(frame, detections)
+            self.raise_incident(detection, datetime.now(), video_time, snapshot)
+            self.incidents_found += 1
+        else:
+            self.on_quiet(video_time)
+
+        while self.pending_clips and video_time >= self.pending_clips[0][1] + CLIP_POST_ROLL_SECONDS:
+            self._finish_clip()
+
+    def raise_incident(self, detection, incident_timestamp, video_time, snapshot):
+        """
+        Handle a confirmed incident
+
+        Saves its media under a provisional name and adds it to self.incidents.
+
+        Args:
+            detection: The accident detection, in the API format
+            incident_timestamp: When the incident was detected (datetime)
+            video_time: Video time of the frame it was confirmed on
+            snapshot: The annotated frame
+        """
+        image_filename, video_filename = self.save_media(f"pending_{uuid.uuid4().hex}", snapshot, video_time)
+        self.incidents.append({
+            "videoTime": video_time,
+            "detection": detection,
+            "timestamp": incident_timestamp.isoformat(),
+            "imageFilename": image_filename,
+            "videoFilename": video_filename
+        })
+
+    def on_quiet(self, video_time):
+        """Called for each processed frame that raised no incident"""
+
+    def save_media(self, basename, snapshot, video_time):
+        """
+        Write an incident's snapshot and schedule its clip
+
+        The clip is cut from the ring buffer once the post-roll has been captured.
+
+        Returns:
+            (image filename, video filename) in PROCESSED_FOLDER
+        """
+        image_filename = f"{basename}.jpg"
+        with self.timer.measure("imwrite"):
+            cv2.imwrite(os.path.join(PROCESSED_FOLDER, image_filename), snapshot)
+
+        video_filename = f"{basename}.mp4"
+        self.pending_clips.append((os.path.join(PROCESSED_FOLDER, video_filename), video_time))
+        return image_filename, video_filename
+
+    def _annotate(self, frame, detections):
+        """Draw the detections into the session's snapshot buffer"""
+        if self._annotated is None or self._annotated.shape != frame.shape:
+            self._annotated = np.empty_like(frame)
+        return self.model.annotate_frame(frame, detections, out=self._annotated)
+
+    def _finish_clip(self):
+        """Cut the oldest pending clip out of the ring buffer and hand it to the encoder pool"""
+        path, incident_time = self.pending_clips.pop(0)
+        frames, times, metas = self.ring.window(incident_time - CLIP_PRE_ROLL_SECONDS,
+                                                incident_time + CLIP_POST_ROLL_SECONDS)
+        # Play back at the rate frames were sampled so the clip runs in real time
+        clip_fps = self.fps
+        if len(times) > 1 and times[-1] > times[0]:
+            clip_fps = (len(times) - 1) / (times[-1] - times[0])
+        # The window is a copy owned by the encoder, so clip frames are annotated in place
+        self.clips.append(self.clip_encoder.submit(
+            path, frames, clip_fps, metas,
+            render=lambda frame, detections: self.model.annotate_frame(frame, detections, out=frame),
+            timer=self.timer))
+        self.clips = [future for future in self.clips if not future.done()]
+
+    def close(self):
+        # Flush the clips still waiting for their post-roll
+        while self.pending_clips:
+            self._finish_clip()
+
+def create_motion_gate():
+    """Motion pre-filter for one video or stream, or None when gating is disabled"""
+    if not MOTION_GATE:
+        return None
+    return MotionGate(pixel_threshold=MOTION_PIXEL_THRESHOLD, min_changed_fraction=MOTION_MIN_CHANGED,
+                      max_skipped=MOTION_MAX_SKIPPED)
+
+def run_detection(session, sampler, get_roi, timer, progress=None, total_frames=0):
+    """
+    Run sampled frames through motion gating and inference into a detection session
+
+    Batches stay in the sampler's frame pool slot (if it has one) all the
+    way to the session, which copies what it keeps; the slot is released
+    once the session is done with the batch, and the pool is closed at the end.
+
+    Args:
+        session: DetectionSession receiving the detections
+        sampler: FrameSampler producing the frames
+        get_roi: Returns the RegionOfInterest to apply (or None), checked once per batch
+        timer: StageTimer for the run's stages
+        progress: Optional callback receiving progress fields as keyword arguments
+        total_frames: Frames in the video, reported with progress
+
+    Returns:
+        (motion gate or None, pipeline) of the run, for its stats
+    """
+    yolo_model = session.model
+    gate = create_motion_gate()
+    letterbox = create_letterbox()
+
+    def detect_motion(batch):
+        # Flag the frames that changed enough (within the ROI) to be worth
+        # running the model on
+        frame_numbers, frames, slot = batch
+        roi = get_roi()
+        if gate is None:
+            return frame_numbers, frames, slot, np.ones(len(frames), dtype=bool), roi
+        regions = roi.crop(frames) if roi is not None else frames
+        with timer.measure("motion", len(frames)):
+            moving = np.fromiter((gate.check(region) for region in regions), dtype=bool, count=len(frames))
+        return frame_numbers, frames, slot, moving, roi
+
+    def run_inference(batch):
+        # Run YOLO detection on the batch's moving frames with a single model
+        # call; the still frames get None
+        frame_numbers, frames, slot, moving, roi = batch
+        detections = [None] * len(frames)
+        inferred = int(moving.sum())
+        if inferred:
+            results = detect_in_roi(yolo_model, roi, frames, moving, letterbox, timer, stream=session)
+            for i, result in zip(np.flatnonzero(moving), results):
+                detections[i] = result
+        pipeline_counters.add("framesInferred", inferred)
+        pipeline_counters.add("framesSkippedStatic", len(frames) - inferred)
+        return frame_numbers, frames, slot, detections
+
+    # Decode, motion detection, inference and annotate/encode run
+    # concurrently in separate threads, connected by bounded queues
+    pipeline = StagedPipeline(
+        ("decode", sampler),
+        [("motion", detect_motion), ("inference", run_inference)],
+        queue_depths=[DECODE_QUEUE_DEPTH, DECODE_QUEUE_DEPTH, INFERENCE_QUEUE_DEPTH],
+        sink_name="encode"
+    )
+    pool = sampler.pool
+    batches = iter(pipeline)
+    frames_counted = 0
+    try:
+        for frame_numbers, frames, slot, batch_detections in batches:
+            decoded = sampler.frames_decoded
+            pipeline_counters.add("framesDecoded", decoded - frames_counted)
+            frames_counted = decoded
+            for frame_count, frame, detections in zip(frame_numbers, frames, batch_detections):
+                session.process_frame(frame_count, frame, detections)
+
+                # Update job progress periodically
+                if session.processed_frames % 10 == 0:
+                    if progress:
+                        progress(framesDecoded=sampler.frames_decoded, framesInferred=session.inferred_frames,
+                                 totalFrames=total_frames, incidentsFound=session.incidents_found)
+            if slot is not None:
+                pool.release(slot)
+    finally:
+        if pool is not None:
+            # Before stopping the pipeline, so a decode thread waiting for a
+            # slot after an error fails instead of holding up the shutdown
+            pool.close()
+        batches.close()
+
+    session.close()
+    return gate, pipeline
+
+def create_frame_pool(cap, batch_size):
+    """Pool a video's sampled batches are decoded into, or None when pooling is disabled or the frame size is unknown"""
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if FRAME_POOL_SLOTS <= 0 or width <= 0 or height <= 0:
+        return None
+    return FramePool((height, width, 3), FRAME_POOL_SLOTS, batch_size)
@@ -0,0 +1,150 @@
+import itertools
+import json
+import queue
+import threading
+import logging
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    One connected client's bounded event buffer.
+    """
+
+    def __init__(self, broker: "EventBroker", types: Optional[Sequence[str]], max_buffer: int):
+        self.broker = broker
+        self.types = set(types) if types else None
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max_buffer)
+        # Set when the client fell too far behind and was cut off
+        self.overflowed = False
+
+    def wants(self, event_type: str) -> bool:
+        return self.types is None or event_type in self.types
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    """
+    Fan-out of server events to connected clients.
+
+    publish() never blocks: each subscriber has a bounded buffer, and a
+    subscriber whose buffer is full is dropped (it receives a final
+    "resync" event telling it to refetch state) instead of slowing down
+    the detection workers that publish. Recent events are kept so that a
+    client reconnecting with Last-Event-ID can catch up on what it missed.
+    """
+
+    def __init__(self, max_buffer: int = 100, history: int = 200):
+        """
+        Args:
+            max_buffer: Events buffered per client before it is dropped as a slow consumer
+            history: Recent events kept for clients resuming with Last-Event-ID
+        """
+        self.max_buffer = max_buffer
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._history: deque = deque(maxlen=history)
+        self._ids = itertools.count(1)
+        self.events_published = 0
+        self.subscribers_dropped = 0
+
+    def publish(self, event_type: str, data: Any):
+        with self._lock:
+            event = (next(self._ids), event_type, data)
+            self._history.append(event)
+            self.events_published += 1
+            subscribers = list(self._subscribers)
+
+        for sub in subscribers:
+            if sub.overflowed or not sub.wants(event_type):
+                continue
+            try:
+                sub.queue.put_nowait(event)
+            except queue.Full:
+                self._drop(sub)
+
+    def subscribe(self, types: Optional[Sequence[str]] = None, last_event_id: Optional[int] = None) -> Subscription:
+        """
+        Register a client
+
+        Args:
+            types: Event types to receive (None for all)
+            last_event_id: Replay buffered events after this id
+        """
+        sub = Subscription(self, types, self.max_buffer)
+        with self._lock:
+            if last_event_id is not None:
+                missed = [event for event in self._history if event[0] > last_event_id and sub.wants(event[1])]
+                if self._history and self._history[0][0] > last_event_id + 1:
+                    # Some missed events are no longer in the history
+                    missed.insert(0, (self._history[0][0] - 1, "resync", {}))
+                for event in missed[-self.max_buffer:]:
+                    sub.queue.put_nowait(event)
+            self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "eventsPublished": self.events_published,
+                "subscribersDropped": self.subscribers_dropped
+            }
+
+    def stream(self, sub: Subscription, keepalive: float = 15.0) -> Iterator[str]:
+        """
+        Server-Sent-Events text for a subscription; ends when the client is dropped
+
+        Args:
+            sub: Subscription to stream
+            keepalive: Seconds of silence before a comment line is sent to keep proxies from timing out
+        """
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event_id, event_type, data = sub.queue.get(timeout=keepalive)
+                except queue.Empty:
+                    if sub.overflowed:
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                id_line = f"id: {event_id}\n" if event_id else ""
+                yield f"{id_line}event: {event_type}\ndata: {json.dumps(data)}\n\n"
+                if event_type == "resync" and sub.overflowed:
+                    break
+        finally:
+            sub.close()
+
+    def _drop(self, sub: Subscription):
+        with self._lock:
+            if sub.overflowed:
+                return
+            sub.overflowed = True
+            self.subscribers_dropped += 1
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+        # Replace the backlog with one last event telling the client to refetch
+        while True:
+            try:
+                while True:
+                    sub.queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                sub.queue.put_nowait((None, "resync", {"reason": "slow consumer"}))
+                break
+            except queue.Full:
+                # A publisher raced us; drain again
+                continue
+        logger.warning("Dropped slow event subscriber")
@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class PoolClosed(Exception):
+    """Raised by FramePool.acquire once the pool has been closed"""
+
+
+class FramePool:
+    """
+    Fixed set of preallocated frame slots.
+
+    Each slot is a slot_frames x H x W x 3 uint8 array (a batch of frames,
+    or a single frame with slot_frames=1). Frames are decoded straight into
+    a slot and handed from stage to stage by slot index, so a frame is
+    never copied on its way to inference, and no frame memory is allocated
+    after the pool is created.
+
+    acquire() hands out a free slot and release() returns it. acquire()
+    blocks while every slot is in use, which holds back the producer when
+    the consumers fall behind.
+    """
+
+    def __init__(self, frame_shape: Sequence[int], slots: int, slot_frames: int = 1):
+        """
+        Create a pool
+
+        Args:
+            frame_shape: (height, width, 3) of the frames
+            slots: Number of slots
+            slot_frames: Frames per slot
+        """
+        self.frame_shape = tuple(int(n) for n in frame_shape)
+        self.slots = max(1, slots)
+        self.slot_frames = max(1, slot_frames)
+        self._array = np.empty((self.slots, self.slot_frames) + self.frame_shape, dtype=np.uint8)
+
+        self._cond = threading.Condition()
+        self._in_use = [False] * self.slots
+        self._free = list(range(self.slots - 1, -1, -1))
+        self._closed = False
+
+        # Counters
+        self.acquired = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def view(self, slot: int) -> np.ndarray:
+        """The slot's slot_frames x H x W x 3 array (a view, no copy)"""
+        return self._array[slot]
+
+    def acquire(self) -> int:
+        """
+        Take a free slot, waiting for one if all are in use
+
+        Returns:
+            Index of the slot
+
+        Raises:
+            PoolClosed: If the pool is (or gets) closed
+        """
+        with self._cond:
+            if not self._free and not self._closed:
+                self.waits += 1
+                start = time.perf_counter()
+                while not self._free and not self._closed:
+                    self._cond.wait()
+                self.wait_seconds += time.perf_counter() - start
+            if self._closed:
+                raise PoolClosed("Frame pool is closed")
+            slot = self._free.pop()
+            self._in_use[slot] = True
+            self.acquired += 1
+            return slot
+
+    def release(self, slot: int):
+        """Return a slot to the pool"""
+        with self._cond:
+            if not self._in_use[slot]:
+                raise ValueError(f"Frame pool slot {slot} is not in use")
+            self._in_use[slot] = False
+            self._free.append(slot)
+            self._cond.notify()
+
+    def in_use(self) -> int:
+        with self._cond:
+            return self.slots - len(self._free)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "slots": self.slots,
+            "slotsInUse": self.in_use(),
+            "acquired": self.acquired,
+            "waits": self.waits,
+            "waitSeconds": round(self.wait_seconds, 4)
+        }
+
+    def close(self):
+        """Wake and fail any waiting acquire() (safe to call more than once)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -0,0 +1,135 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class LatencyGovernor:
+    """
+    Keeps real-time processing within a latency budget by adapting how many
+    source frames are skipped between processed frames.
+
+    The governor tracks the end-to-end age of processed frames (capture to
+    end of processing) as an exponentially weighted moving average. While
+    the average is over budget the sampling interval grows multiplicatively;
+    once it is comfortably under budget the interval shrinks one frame at a
+    time (AIMD, as in TCP congestion control). Frames that already exceed
+    the budget when they are picked up are dropped without processing.
+
+    Sampled frames that are superseded before the processor gets to them
+    were decoded for nothing, so each one also widens the interval by a
+    frame; this settles the sampling rate near the rate the processor
+    actually sustains.
+    """
+
+    def __init__(self, latency_budget: float = 0.5, initial_interval: int = 1,
+                 min_interval: int = 1, max_interval: int = 250,
+                 smoothing: float = 0.2, rate_window: int = 30):
+        """
+        Initialize the governor
+
+        Args:
+            latency_budget: Target end-to-end frame age in seconds
+            initial_interval: Starting sampling interval in source frames
+            min_interval: Smallest interval (1 = process every frame)
+            max_interval: Largest interval
+            smoothing: EWMA weight of the newest lag sample
+            rate_window: Number of recent processed frames used for the FPS estimate
+        """
+        self.latency_budget = latency_budget
+        self.min_interval = max(1, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.interval = min(self.max_interval, max(self.min_interval, initial_interval))
+        self.smoothing = smoothing
+
+        self._lock = threading.Lock()
+        self._finished = deque(maxlen=rate_window)
+        self._since_sample = 0
+        self.lag: Optional[float] = None
+        self.last_lag = 0.0
+        self.frames_sampled = 0
+        self.frames_skipped = 0
+        self.frames_dropped_stale = 0
+        self.frames_superseded = 0
+        self._superseded_since_record = False
+
+    def should_sample(self) -> bool:
+        """Called once per source frame; True if the frame should be decoded and offered for processing"""
+        with self._lock:
+            self._since_sample += 1
+            if self._since_sample >= self.interval:
+                self._since_sample = 0
+                self.frames_sampled += 1
+                return True
+            self.frames_skipped += 1
+            return False
+
+    def admit(self, frame_age: float) -> bool:
+        """Called when a sampled frame is picked up; False if it is already too old to be worth processing"""
+        if frame_age > self.latency_budget:
+            with self._lock:
+                self.frames_dropped_stale += 1
+                self._increase()
+            return False
+        return True
+
+    def superseded(self):
+        """Called when a sampled frame is replaced by a newer one before being processed"""
+        with self._lock:
+            self.frames_superseded += 1
+            self._superseded_since_record = True
+            if self.interval < self.max_interval:
+                self.interval += 1
+
+    def record(self, frame_age: float, process_seconds: float = 0.0):
+        """
+        Record the end-to-end age of a frame that has just been processed
+
+        Args:
+            frame_age: Seconds from capture to the end of processing
+            process_seconds: Part of frame_age spent processing the frame
+        """
+        with self._lock:
+            self._finished.append(time.monotonic())
+            self.last_lag = frame_age
+            if self.lag is None:
+                self.lag = frame_age
+            else:
+                self.lag += self.smoothing * (frame_age - self.lag)
+
+            # Sampling less only helps with time spent waiting for the
+            # processor; if processing alone blows the budget, skipping more
+            # frames won't bring the lag down
+            waited = frame_age - process_seconds
+            if self.lag > self.latency_budget and waited > 0.1 * self.latency_budget:
+                self._increase()
+            elif (self.lag < 0.5 * self.latency_budget and not self._superseded_since_record
+                    and self.interval > self.min_interval):
+                self.interval -= 1
+            self._superseded_since_record = False
+
+    def processed_fps(self) -> float:
+        with self._lock:
+            if len(self._finished) < 2:
+                return 0.0
+            span = self._finished[-1] - self._finished[0]
+            return (len(self._finished) - 1) / span if span > 0 else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        fps = self.processed_fps()
+        return {
+            "budgetMs": round(1000 * self.latency_budget, 1),
+            "lagMs": round(1000 * self.lag, 1) if self.lag is not None else None,
+            "lastLagMs": round(1000 * self.last_lag, 1),
+            "intervalFrames": self.interval,
+            "processedFps": round(fps, 2),
+            "framesSampled": self.frames_sampled,
+            "framesSkipped": self.frames_skipped,
+            "framesDroppedStale": self.frames_dropped_stale,
+            "framesSuperseded": self.frames_superseded
+        }
+
+    def _increase(self):
+        # Caller holds self._lock
+        self.interval = min(self.max_interval, max(self.interval + 1, math.ceil(self.interval * 1.5)))
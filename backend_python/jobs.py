@@ -0,0 +1,294 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class Job:
+    """
+    A unit of background work (e.g. processing one uploaded video).
+    """
+
+    def __init__(self, kind: str, params: Dict[str, Any], priority: int = 0, job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.priority = priority
+        self.status = "queued"
+        self.progress: Dict[str, Any] = {}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        # Bumped on every status or progress change, used by waiters
+        self.version = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "priority": self.priority,
+            "status": self.status,
+            "version": self.version,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Job":
+        job = cls(data["kind"], data.get("params", {}), data.get("priority", 0), job_id=data["id"])
+        job.status = data.get("status", "queued")
+        job.progress = data.get("progress", {})
+        job.result = data.get("result")
+        job.error = data.get("error")
+        job.created_at = data.get("createdAt", job.created_at)
+        job.started_at = data.get("startedAt")
+        job.finished_at = data.get("finishedAt")
+        job.version = data.get("version", 0)
+        return job
+
+
+class JobManager:
+    """
+    Bounded worker pool fed by a priority queue of jobs.
+
+    Jobs with a lower priority value run first; jobs with equal priority run
+    in submission order. Job records are persisted to a JSON file so that jobs
+    which were queued or running when the process stopped are re-queued on
+    the next start.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue_size: int = 100,
+                 state_path: Optional[str] = None, max_finished_jobs: int = 500):
+        """
+        Initialize the job manager
+
+        Args:
+            max_workers: Number of worker threads processing jobs
+            max_queue_size: Maximum number of jobs waiting to run
+            state_path: JSON file used to persist job records (None disables persistence)
+            max_finished_jobs: Number of finished job records to retain
+        """
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.state_path = state_path
+        self.max_finished_jobs = max_finished_jobs
+
+        self._handlers: Dict[str, Callable[..., Any]] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._pending = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._workers: List[threading.Thread] = []
+
+        self._load()
+
+    def register(self, kind: str, handler: Callable[..., Any]):
+        """
+        Register the handler for a kind of job
+
+        The handler is called as handler(job, **job.params) and its return
+        value is stored as the job result.
+        """
+        self._handlers[kind] = handler
+
+    def start(self):
+        """Start the worker threads"""
+        if self._workers:
+            return
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"Job manager started with {self.max_workers} workers")
+
+    def is_full(self) -> bool:
+        with self._lock:
+            return self._pending >= self.max_queue_size
+
+    def submit(self, kind: str, params: Dict[str, Any], priority: int = 0) -> Job:
+        """
+        Queue a new job
+
+        Raises:
+            JobQueueFull: If max_queue_size jobs are already waiting
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind: {kind}")
+
+        with self._lock:
+            if self._pending >= self.max_queue_size:
+                raise JobQueueFull(f"Job queue is full ({self.max_queue_size} jobs waiting)")
+            job = Job(kind, params, priority)
+            self._jobs[job.id] = job
+            self._enqueue(job)
+            self._persist()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def snapshot(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a consistent copy of a job record"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [job.to_dict() for job in self._jobs.values()]
+
+    def update_progress(self, job_id: str, **fields):
+        """Merge progress fields into a running job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.progress.update(fields)
+            self._touch(job)
+
+    def wait(self, job_id: str, since_version: int = -1, timeout: float = 30.0) -> Optional[Dict[str, Any]]:
+        """
+        Block until a job changes past since_version, finishes, or the timeout expires
+
+        Args:
+            job_id: Job to wait on
+            since_version: Last version the caller has seen
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Snapshot of the job, or None if the job does not exist
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return None
+                remaining = deadline - time.monotonic()
+                if job.version > since_version or job.finished or remaining <= 0:
+                    return job.to_dict()
+                self._changed.wait(remaining)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.status == "running")
+            return {
+                "workers": self.max_workers,
+                "queued": self._pending,
+                "running": running,
+                "capacity": self.max_queue_size
+            }
+
+    # Internal helpers (callers must hold self._lock where noted)
+
+    def _touch(self, job: Job):
+        # Caller holds self._lock
+        job.version += 1
+        self._changed.notify_all()
+
+    def _enqueue(self, job: Job):
+        # Caller holds self._lock
+        self._seq += 1
+        self._pending += 1
+        self._queue.put((job.priority, self._seq, job.id))
+
+    def _worker(self):
+        while True:
+            _, _, job_id = self._queue.get()
+            with self._lock:
+                self._pending -= 1
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                job.status = "running"
+                job.started_at = datetime.now().isoformat()
+                self._persist()
+                self._touch(job)
+
+            try:
+                result = self._handlers[job.kind](job, **job.params)
+                with self._lock:
+                    job.status = "completed"
+                    job.result = result
+            except Exception as e:
+                logger.exception(f"Job {job.id} ({job.kind}) failed")
+                with self._lock:
+                    job.status = "failed"
+                    job.error = str(e)
+
+            with self._lock:
+                job.finished_at = datetime.now().isoformat()
+                self._touch(job)
+                self._prune()
+                self._persist()
+
+    def _prune(self):
+        # Caller holds self._lock
+        finished = [job for job in self._jobs.values() if job.finished]
+        excess = len(finished) - self.max_finished_jobs
+        if excess > 0:
+            finished.sort(key=lambda job: job.finished_at or "")
+            for job in finished[:excess]:
+                del self._jobs[job.id]
+
+    def _persist(self):
+        # Caller holds self._lock
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump([job.to_dict() for job in self._jobs.values()], f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.error(f"Error persisting job state: {e}")
+
+    def _load(self):
+        if not self.state_path or not os.path.isfile(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                records = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading job state: {e}")
+            return
+
+        requeued = 0
+        with self._lock:
+            for record in sorted(records, key=lambda r: r.get("createdAt", "")):
+                job = Job.from_dict(record)
+                self._jobs[job.id] = job
+                if not job.finished:
+                    # Interrupted jobs start over from the beginning
+                    job.status = "queued"
+                    job.progress = {}
+                    job.started_at = None
+                    self._enqueue(job)
+                    requeued += 1
+        if requeued:
+            logger.info(f"Re-queued {requeued} unfinished jobs from {self.state_path}")
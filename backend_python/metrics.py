@@ -0,0 +1,493 @@
+import bisect
+import os
+import threading
+import time
+import logging
+import numpy as np
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Link speed assumed when the interface doesn't report one
+DEFAULT_LINK_MBPS = 1000.0
+
+
+def read_cpu_times() -> Optional[Tuple[int, int]]:
+    """(busy, total) jiffies across all CPUs from /proc/stat"""
+    try:
+        with open("/proc/stat") as f:
+            values = [int(v) for v in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+    total = sum(values[:8])  # guest time is already included in user/nice
+    return total - idle, total
+
+
+def read_memory() -> Optional[Tuple[int, int]]:
+    """(total, available) memory in bytes from /proc/meminfo"""
+    info = {}
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                info[key] = int(rest.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    if "MemTotal" not in info:
+        return None
+    available = info.get("MemAvailable", info.get("MemFree", 0))
+    return info["MemTotal"], available
+
+
+def read_network() -> Optional[Tuple[int, float]]:
+    """(rx + tx bytes, combined link speed in Mbps) over non-loopback interfaces"""
+    total = 0
+    link_mbps = 0.0
+    try:
+        with open("/proc/net/dev") as f:
+            lines = f.readlines()[2:]
+    except OSError:
+        return None
+    for line in lines:
+        name, _, data = line.partition(":")
+        name = name.strip()
+        if name == "lo":
+            continue
+        fields = data.split()
+        total += int(fields[0]) + int(fields[8])
+        try:
+            with open(f"/sys/class/net/{name}/speed") as f:
+                speed = float(f.read().strip())
+            link_mbps += speed if speed > 0 else DEFAULT_LINK_MBPS
+        except (OSError, ValueError):
+            link_mbps += DEFAULT_LINK_MBPS
+    return total, link_mbps or DEFAULT_LINK_MBPS
+
+
+def read_disk_usage(paths: Sequence[str]) -> Tuple[int, int]:
+    """(used, total) bytes over the filesystems holding paths, counting each filesystem once"""
+    used = 0
+    total = 0
+    seen = set()
+    for path in paths:
+        try:
+            device = os.stat(path).st_dev
+            if device in seen:
+                continue
+            seen.add(device)
+            st = os.statvfs(path)
+        except OSError:
+            continue
+        total += st.f_blocks * st.f_frsize
+        used += (st.f_blocks - st.f_bfree) * st.f_frsize
+    return used, total
+
+
+class SystemMetricsReader:
+    """
+    Reads host CPU, memory, disk and network usage.
+
+    CPU and network are rates, so each read() reports usage since the
+    previous read().
+    """
+
+    def __init__(self, storage_paths: Sequence[str]):
+        self.storage_paths = list(storage_paths)
+        self._last_cpu = read_cpu_times()
+        self._last_net = read_network()
+        self._last_time = time.monotonic()
+
+    def read(self) -> Dict[str, float]:
+        now = time.monotonic()
+        elapsed = max(now - self._last_time, 1e-6)
+        self._last_time = now
+        values: Dict[str, float] = {}
+
+        cpu = read_cpu_times()
+        if cpu and self._last_cpu:
+            busy = cpu[0] - self._last_cpu[0]
+            total = cpu[1] - self._last_cpu[1]
+            values["cpu_usage"] = 100.0 * busy / total if total > 0 else 0.0
+        self._last_cpu = cpu
+
+        memory = read_memory()
+        if memory:
+            values["memory_usage"] = 100.0 * (memory[0] - memory[1]) / memory[0]
+
+        used, total = read_disk_usage(self.storage_paths)
+        if total:
+            values["storage_used_gb"] = used / 1e9
+            values["storage_total_gb"] = total / 1e9
+            values["storage_percentage"] = 100.0 * used / total
+
+        net = read_network()
+        if net and self._last_net:
+            mbps = 8 * max(0, net[0] - self._last_net[0]) / elapsed / 1e6
+            values["network_mbps"] = mbps
+            values["network_load"] = min(100.0, 100.0 * mbps / net[1])
+        self._last_net = net
+
+        return values
+
+
+class RateCounters:
+    """
+    Thread-safe event counters reported as per-second rates.
+
+    Hot paths call add(); the collector calls rates() once per sample and
+    gets the rate of each counter since its previous call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._last_counts: Dict[str, int] = {}
+        self._last_time = time.monotonic()
+
+    def add(self, name: str, count: int = 1):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + count
+
+    def totals(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def rates(self) -> Dict[str, float]:
+        with self._lock:
+            now = time.monotonic()
+            elapsed = max(now - self._last_time, 1e-6)
+            rates = {name: (count - self._last_counts.get(name, 0)) / elapsed
+                     for name, count in self._counts.items()}
+            self._last_counts = dict(self._counts)
+            self._last_time = now
+            return rates
+
+
+class TimeSeriesRing:
+    """
+    Fixed-size time series of samples with a fixed set of numeric fields,
+    stored in preallocated NumPy arrays. Missing values are NaN.
+    """
+
+    def __init__(self, fields: Sequence[str], capacity: int):
+        self.fields = list(fields)
+        self.capacity = capacity
+        self._index = {name: i for i, name in enumerate(self.fields)}
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._values = np.full((capacity, len(self.fields)), np.nan, dtype=np.float64)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, timestamp: float, values: Dict[str, float]):
+        row = self._values[self._next]
+        row.fill(np.nan)
+        for name, value in values.items():
+            i = self._index.get(name)
+            if i is not None:
+                row[i] = value
+        self._times[self._next] = timestamp
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def ordered(self, last: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(times, values) of the newest `last` samples in chronological order"""
+        count = self._count if last is None else min(last, self._count)
+        order = (self._next - count + np.arange(count)) % self.capacity
+        return self._times[order], self._values[order]
+
+    def to_dict(self, fields: Optional[Sequence[str]] = None, last: Optional[int] = None) -> Dict[str, List]:
+        times, values = self.ordered(last)
+        fields = [f for f in (fields or self.fields) if f in self._index]
+        series: Dict[str, List] = {"timestamps": [round(t, 3) for t in times.tolist()]}
+        for name in fields:
+            column = values[:, self._index[name]]
+            series[name] = [None if np.isnan(v) else round(v, 3) for v in column.tolist()]
+        return series
+
+
+class MetricsCollector:
+    """
+    Samples metrics on a fixed schedule into a raw ring buffer, and rolls
+    every `rollup_every` raw samples up into a downsampled ring holding
+    their averages, so long history costs a fixed amount of memory.
+    """
+
+    def __init__(self, fields: Sequence[str], sample: Callable[[], Dict[str, float]],
+                 interval: float = 5.0, raw_capacity: int = 720,
+                 rollup_every: int = 12, rollup_capacity: int = 1440,
+                 on_sample: Optional[Callable[[Dict[str, float]], None]] = None):
+        """
+        Initialize the collector
+
+        Args:
+            fields: Numeric fields recorded in the time series
+            sample: Returns the current value of each field
+            interval: Seconds between samples
+            raw_capacity: Raw samples kept (default one hour at 5 s)
+            rollup_every: Raw samples averaged into one downsampled sample (default one minute)
+            rollup_capacity: Downsampled samples kept (default one day)
+            on_sample: Called with each new sample
+        """
+        self.fields = list(fields)
+        self.sample_fn = sample
+        self.interval = interval
+        self.rollup_every = rollup_every
+        self.on_sample = on_sample
+        self.raw = TimeSeriesRing(self.fields, raw_capacity)
+        self.rollup = TimeSeriesRing(self.fields, rollup_capacity)
+        self._lock = threading.Lock()
+        self._since_rollup = 0
+        self._latest: Dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="metrics-collector", daemon=True)
+        self._thread.start()
+
+    def collect(self) -> Dict[str, float]:
+        """Take one sample now"""
+        values = self.sample_fn()
+        now = time.time()
+        with self._lock:
+            self.raw.append(now, values)
+            self._latest = values
+            self._since_rollup += 1
+            if self._since_rollup >= self.rollup_every:
+                self._since_rollup = 0
+                times, rows = self.raw.ordered(self.rollup_every)
+                with np.errstate(invalid="ignore"):
+                    # Columns that are all NaN stay NaN (with a RuntimeWarning suppressed)
+                    means = np.nanmean(rows, axis=0) if len(rows) else rows
+                self.rollup.append(float(times[-1]), dict(zip(self.fields, means.tolist())))
+        if self.on_sample:
+            self.on_sample(values)
+        return values
+
+    def latest(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._latest)
+
+    def history(self, resolution: str = "raw", fields: Optional[Sequence[str]] = None,
+                last: Optional[int] = None) -> Dict[str, List]:
+        """
+        Time series of recorded samples
+
+        Args:
+            resolution: "raw" for every sample or "rollup" for the downsampled series
+            fields: Fields to include (default all)
+            last: Only the newest `last` samples
+        """
+        ring = self.rollup if resolution == "rollup" else self.raw
+        with self._lock:
+            return ring.to_dict(fields, last)
+
+    def _run(self):
+        next_due = time.monotonic()
+        while True:
+            try:
+                self.collect()
+            except Exception:
+                logger.exception("Error collecting metrics")
+            next_due += self.interval
+            time.sleep(max(0.0, next_due - time.monotonic()))
+
+
+# Counters incremented by the processing hot paths
+pipeline_counters = RateCounters()
+
+
+# Prometheus exposition
+#
+# Metrics are sharded per thread: each thread updates its own series without
+# taking a lock (the GIL makes the individual updates atomic), and a scrape
+# merges the shards. Shards of threads that have exited are folded into a
+# retired shard so thread churn doesn't grow memory.
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    labels = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class _ShardedMetric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, Dict[tuple, list]]] = []
+        self._retired: Dict[tuple, list] = {}
+
+    def _series(self, key: tuple) -> list:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        series = shard.get(key)
+        if series is None:
+            series = shard[key] = self._new_series()
+        return series
+
+    def _new_series(self) -> list:
+        raise NotImplementedError
+
+    def _merged(self) -> Dict[tuple, list]:
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    self._merge_into(self._retired, shard)
+            self._shards = alive
+            merged: Dict[tuple, list] = {}
+            self._merge_into(merged, self._retired)
+            for _, shard in alive:
+                self._merge_into(merged, shard)
+        return merged
+
+    def _merge_into(self, target: Dict[tuple, list], shard: Dict[tuple, list]):
+        # list() copies the items atomically even while the owning thread adds series
+        for key, series in list(shard.items()):
+            total = target.get(key)
+            if total is None:
+                target[key] = list(series)
+            else:
+                for i, value in enumerate(series):
+                    total[i] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, series in sorted(self._merged().items()):
+            lines.extend(self._render_series(key, series))
+        return lines
+
+    def _render_series(self, key: tuple, series: list) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_ShardedMetric):
+    """Monotonic counter"""
+    kind = "counter"
+
+    def inc(self, key: tuple, amount: float = 1):
+        """Increment the series with label values key"""
+        self._series(key)[0] += amount
+
+    def _new_series(self) -> list:
+        return [0]
+
+    def _render_series(self, key, series):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {series[0]}"]
+
+
+class Histogram(_ShardedMetric):
+    """Histogram with fixed bucket bounds"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, key: tuple, value: float):
+        """Record value in the series with label values key"""
+        series = self._series(key)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def _new_series(self) -> list:
+        # One count per bucket, one for +Inf, then the sum
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def _render_series(self, key, series):
+        lines = []
+        cumulative = 0
+        bounds = [repr(float(b)) for b in self.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, series):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {series[-1]}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+stage_seconds = Histogram(
+    "accident_detector_stage_seconds",
+    "Time spent in each processing stage per call",
+    ("stage", "camera"))
+stage_frames = Counter(
+    "accident_detector_stage_frames_total",
+    "Frames handled by each processing stage",
+    ("stage", "camera"))
+
+
+class StageTimer:
+    """
+    Records stage timings for one camera into stage_seconds and
+    stage_frames. Series are labelled by camera only, which keeps their
+    number bounded; per-job timings are in each job result's "stages".
+
+    Stages used by the detector: read (decoding frames from the source),
+    predict (model inference), annotate (drawing detections), imwrite
+    (incident snapshots) and video_write (incident clip frames).
+    """
+
+    def __init__(self, camera: str = ""):
+        self.camera = camera or ""
+
+    def observe(self, stage: str, seconds: float, frames: int = 1):
+        key = (stage, self.camera)
+        stage_seconds.observe(key, seconds)
+        stage_frames.inc(key, frames)
+
+    @contextmanager
+    def measure(self, stage: str, frames: int = 1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, frames)
+
+
+def format_gauges(values: Dict[str, float], prefix: str) -> List[str]:
+    """Prometheus text lines for a dict of gauge values"""
+    lines = []
+    for name, value in sorted(values.items()):
+        if value is None or value != value:  # Skip missing and NaN values
+            continue
+        lines.append(f"# TYPE {prefix}{name} gauge")
+        lines.append(f"{prefix}{name} {value}")
+    return lines
+
+
+def render_prometheus(gauges: Optional[Dict[str, float]] = None) -> str:
+    """Everything exposed at /metrics, in Prometheus text format"""
+    lines = []
+    for metric in (stage_seconds, stage_frames):
+        lines.extend(metric.render())
+    if gauges:
+        lines.extend(format_gauges(gauges, "accident_detector_"))
+    return "\n".join(lines) + "\n"
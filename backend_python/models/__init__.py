@@ -1,5 +1,8 @@
 # This file makes the models directory a Python package
+from .detections import Detections
 from .detector import AccidentDetector
+from .preprocess import Letterbox
 from .yolo_sim import load_model, YOLOv8Simulator
+from .registry import ModelRegistry, get_model, model_registry
 
-__all__ = ['AccidentDetector', 'load_model', 'YOLOv8Simulator']
\ No newline at end of file
+__all__ = ['Detections', 'AccidentDetector', 'Letterbox', 'load_model', 'YOLOv8Simulator', 'ModelRegistry', 'get_model', 'model_registry']
\ No newline at end of file
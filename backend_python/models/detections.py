@@ -0,0 +1,104 @@
+import numpy as np
+from typing import Any, Dict, List, Sequence, Union
+
+
+class Detections:
+    """
+    A frame's detections as parallel NumPy arrays.
+
+    boxes is N x 4 (x1, y1, x2, y2) in pixel coordinates, scores and
+    class_ids have N entries, and class_names maps class ids to names (it
+    is shared with the model, not copied). Filtering and selection are
+    vectorized; detections are only turned into dicts at the API boundary
+    with to_dicts() / to_api().
+    """
+
+    __slots__ = ("boxes", "scores", "class_ids", "class_names")
+
+    def __init__(self, boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray,
+                 class_names: Sequence[str]):
+        self.boxes = boxes
+        self.scores = scores
+        self.class_ids = class_ids
+        self.class_names = class_names
+
+    @classmethod
+    def empty(cls, class_names: Sequence[str]) -> "Detections":
+        return cls(np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32),
+                   np.empty(0, dtype=np.int32), class_names)
+
+    @classmethod
+    def from_dicts(cls, detections: Sequence[Dict[str, Any]], class_names: Sequence[str]) -> "Detections":
+        """
+        Build from dicts in either the model format (class, class_name,
+        confidence, box) or the API format (label, confidence, x, y, width, height)
+        """
+        if not detections:
+            return cls.empty(class_names)
+        boxes = np.empty((len(detections), 4), dtype=np.float32)
+        scores = np.empty(len(detections), dtype=np.float32)
+        class_ids = np.empty(len(detections), dtype=np.int32)
+        for i, det in enumerate(detections):
+            if "box" in det:
+                boxes[i] = det["box"]
+                name = det["class_name"]
+            else:
+                boxes[i] = (det["x"], det["y"], det["x"] + det["width"], det["y"] + det["height"])
+                name = det["label"]
+            scores[i] = det["confidence"]
+            class_ids[i] = det["class"] if "class" in det else list(class_names).index(name)
+        return cls(boxes, scores, class_ids, class_names)
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def __getitem__(self, index: Union[np.ndarray, slice, int]) -> "Detections":
+        """Subset by boolean mask, index array or slice"""
+        if isinstance(index, (int, np.integer)):
+            index = slice(index, index + 1 if index != -1 else None)
+        return Detections(self.boxes[index], self.scores[index], self.class_ids[index], self.class_names)
+
+    def above(self, threshold: float) -> "Detections":
+        """Detections with a score of at least threshold"""
+        return self[self.scores >= threshold]
+
+    def class_mask(self, class_ids: np.ndarray) -> np.ndarray:
+        """Boolean mask of the detections whose class is in class_ids"""
+        return np.isin(self.class_ids, class_ids)
+
+    def best(self, mask: np.ndarray = None) -> int:
+        """Index of the highest-scoring detection (within mask), or -1 if there is none"""
+        if mask is None:
+            return int(np.argmax(self.scores)) if len(self) else -1
+        if not mask.any():
+            return -1
+        return int(np.argmax(np.where(mask, self.scores, -np.inf)))
+
+    def name(self, index: int) -> str:
+        return self.class_names[self.class_ids[index]]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Model-format dicts: class, class_name, confidence, box"""
+        return [
+            {
+                "class": int(class_id),
+                "class_name": self.class_names[class_id],
+                "confidence": float(score),
+                "box": [int(v) for v in box]
+            }
+            for box, score, class_id in zip(self.boxes, self.scores, self.class_ids)
+        ]
+
+    def to_api(self, index: int = None) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        """API-format dicts (label, confidence, x, y, width, height); one dict if index is given"""
+        if index is None:
+            return [self.to_api(i) for i in range(len(self))]
+        x1, y1, x2, y2 = (int(v) for v in self.boxes[index])
+        return {
+            "label": self.name(index),
+            "confidence": float(self.scores[index]),
+            "x": x1,
+            "y": y1,
+            "width": x2 - x1,
+            "height": y2 - y1
+        }
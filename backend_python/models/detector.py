@@ -1,24 +1,36 @@
 import cv2
 import numpy as np
 import random
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
-from .yolo_sim import load_model
+from .detections import Detections
+from .preprocess import Letterbox
+from .registry import get_model
 
 class AccidentDetector:
     """
     Class for detecting accidents in video frames using a YOLOv8 model.
     """
     
-    def __init__(self):
-        """Initialize the accident detector with a YOLOv8 model"""
-        # Load the YOLO model
-        self.model = load_model("yolov8n.pt")  # Simulated model
+    def __init__(self, model_path: str = "yolov8n.pt", input_size: Optional[Tuple[int, int]] = (640, 640),
+                 **model_config):
+        """
+        Initialize the accident detector with a YOLOv8 model (model_config is passed to the model)
+        
+        Frames are letterboxed to input_size (width, height) before inference,
+        or passed at native resolution if it is None. The letterbox buffer
+        belongs to this detector, so use one detector per thread. Each
+        detector is a separate stream to the model (frames are assumed to
+        come from one video, in order).
+        """
+        # Use the shared YOLO model (loaded once per process)
+        self.model = get_model(model_path, **model_config)  # Simulated model
+        self.letterbox = Letterbox(input_size) if input_size else None
         self.accident_classes = self.model.accident_classes
         self.confidence_threshold = 0.5
         print("Accident detector initialized with YOLOv8 model")
     
-    def detect(self, frame):
+    def detect(self, frame) -> Detections:
         """
         Detect accidents in a video frame using YOLOv8
         
@@ -26,81 +38,61 @@ class AccidentDetector:
             frame: The video frame to process
             
         Returns:
-            List of detections in format:
-            [
-                {
-                    "label": class_name,
-                    "confidence": confidence_score,
-                    "x": x_coordinate,
-                    "y": y_coordinate,
-                    "width": width,
-                    "height": height
-                },
-                ...
-            ]
+            Detections above the confidence threshold (use to_api() for the
+            API format: label, confidence, x, y, width, height)
         """
         # Process the frame with YOLO
-        yolo_detections = self.model.predict(frame)
+        if self.letterbox is None:
+            return self.model.predict(frame, stream=self).above(self.confidence_threshold)
+        inputs = self.letterbox.prepare([frame])
+        detections = self.model.predict(inputs[0], size=self.letterbox.size, stream=self)
+        return self.letterbox.restore([detections])[0].above(self.confidence_threshold)
+    
+    def detect_batch(self, frames) -> List[Detections]:
+        """
+        Detect accidents in a batch of video frames with a single model call
         
-        # Convert YOLO detections to our format
-        detections = []
-        for det in yolo_detections:
-            x1, y1, x2, y2 = map(int, det["box"])
-            
-            detection = {
-                "label": det["class_name"],
-                "confidence": det["confidence"],
-                "x": x1,
-                "y": y1,
-                "width": x2 - x1,
-                "height": y2 - y1
-            }
+        Args:
+            frames: Stacked video frames (N x H x W x 3 numpy array) or a list of frames
             
-            # Only include detections above the threshold
-            if det["confidence"] >= self.confidence_threshold:
-                detections.append(detection)
+        Returns:
+            One Detections per frame, in the same format as detect()
+        """
+        if self.letterbox is None:
+            batch_detections = self.model.predict_batch(frames, stream=self)
+        else:
+            inputs = self.letterbox.prepare(frames)
+            batch_detections = self.model.predict_batch(inputs, size=self.letterbox.size, stream=self)
+            batch_detections = self.letterbox.restore(batch_detections)
         
-        return detections
+        return [detections.above(self.confidence_threshold) for detections in batch_detections]
     
-    def annotate_frame(self, frame, detections):
+    def annotate_frame(self, frame, detections, out=None):
         """
         Draw bounding boxes and labels on the frame
         
         Args:
             frame: Original video frame
-            detections: List of detection objects
+            detections: Detections from detect() (or a list of API-format detection dicts)
+            out: Optional buffer to draw into (the frame itself to draw in place)
             
         Returns:
             Annotated frame with bounding boxes and labels
         """
         # Use the model's annotation function directly
-        yolo_detections = []
-        for det in detections:
-            x1 = det["x"]
-            y1 = det["y"]
-            x2 = x1 + det["width"]
-            y2 = y1 + det["height"]
-            
-            yolo_det = {
-                "class_name": det["label"],
-                "confidence": det["confidence"],
-                "box": [x1, y1, x2, y2]
-            }
-            yolo_detections.append(yolo_det)
-        
-        return self.model.annotate_frame(frame, yolo_detections)
+        return self.model.annotate_frame(frame, detections, out)
     
     def is_accident(self, detections):
         """
         Check if any detections are classified as accidents
         
         Args:
-            detections: List of detection objects
+            detections: Detections from detect() (or a list of API-format detection dicts)
             
         Returns:
             True if an accident is detected, False otherwise
         """
-        for det in detections:
-            if det["label"] in self.accident_classes and det["confidence"] >= self.confidence_threshold:
-                return True
-        return False
\ No newline at end of file
+        if not isinstance(detections, Detections):
+            detections = Detections.from_dicts(detections, self.model.classes)
+        detections = detections.above(self.confidence_threshold)
+        return bool(detections.class_mask(self.model.accident_class_ids).any())
@@ -0,0 +1,114 @@
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .detections import Detections
+
+# Gray the letterbox border is filled with, as in YOLOv8's own preprocessing
+PAD_VALUE = 114
+
+
+class Letterbox:
+    """
+    Resizes frames to the model's input size, preserving aspect ratio and
+    padding the remainder, into a preallocated input batch.
+
+    The batch (N x height x width x 3, contiguous) is reused across calls
+    and only grows when a larger batch comes in, so preprocessing memory
+    is fixed by the input size instead of the camera resolution. Boxes the
+    model finds on the batch are mapped back to the source frames with
+    restore().
+
+    A Letterbox holds the geometry of the last prepare() call and is meant
+    to be owned by one pipeline (not shared between threads).
+    """
+
+    def __init__(self, size: Tuple[int, int] = (640, 640), pad_value: int = PAD_VALUE):
+        """
+        Initialize the letterbox
+
+        Args:
+            size: Model input (width, height)
+            pad_value: Gray level of the padding
+        """
+        self.size = (int(size[0]), int(size[1]))
+        self.pad_value = pad_value
+        self._batch = np.full((0, self.size[1], self.size[0], 3), pad_value, dtype=np.uint8)
+        # Source (height, width) each batch slot was last laid out for, so
+        # the padding is only refilled when the geometry changes
+        self._slot_shapes: List[Optional[Tuple[int, int]]] = []
+        self._layouts: Dict[Tuple[int, int], Tuple[float, int, int, int, int]] = {}
+        self._transforms = np.zeros((0, 3), dtype=np.float32)
+        self._source_shapes: List[Tuple[int, int]] = []
+
+    def layout(self, height: int, width: int) -> Tuple[float, int, int, int, int]:
+        """(scale, resized width, resized height, left, top) for a source frame size"""
+        layout = self._layouts.get((height, width))
+        if layout is None:
+            scale = min(self.size[0] / width, self.size[1] / height)
+            resized_width = max(1, min(self.size[0], round(width * scale)))
+            resized_height = max(1, min(self.size[1], round(height * scale)))
+            left = (self.size[0] - resized_width) // 2
+            top = (self.size[1] - resized_height) // 2
+            layout = self._layouts[(height, width)] = (scale, resized_width, resized_height, left, top)
+        return layout
+
+    def prepare(self, frames: Sequence[np.ndarray], selected: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Letterbox frames into the input batch
+
+        Args:
+            frames: Stacked frames (N x H x W x 3) or a list of frames of any size
+            selected: Boolean mask of the frames to prepare (default all)
+
+        Returns:
+            View of the input batch holding the prepared frames, valid until the next call
+        """
+        indices = range(len(frames)) if selected is None else np.flatnonzero(selected)
+        count = len(indices)
+        self._reserve(count)
+        self._transforms = np.empty((count, 3), dtype=np.float32)
+        self._source_shapes = []
+        for slot, i in enumerate(indices):
+            frame = frames[i]
+            height, width = frame.shape[:2]
+            scale, resized_width, resized_height, left, top = self.layout(height, width)
+            if self._slot_shapes[slot] != (height, width):
+                self._batch[slot] = self.pad_value
+                self._slot_shapes[slot] = (height, width)
+            cv2.resize(frame, (resized_width, resized_height),
+                       dst=self._batch[slot, top:top + resized_height, left:left + resized_width],
+                       interpolation=cv2.INTER_LINEAR)
+            self._transforms[slot] = (scale, left, top)
+            self._source_shapes.append((height, width))
+        return self._batch[:count]
+
+    def restore(self, results: Sequence[Detections]) -> List[Detections]:
+        """
+        Map detections on the prepared batch back to their source frames
+
+        Args:
+            results: One Detections per prepared frame, in batch order
+
+        Returns:
+            The detections with boxes in source frame pixels, clipped to the frame.
+            Boxes that lay entirely in the padding are dropped.
+        """
+        restored = []
+        for (scale, left, top), (height, width), detections in zip(self._transforms, self._source_shapes, results):
+            boxes = (detections.boxes - (left, top, left, top)) / scale
+            np.clip(boxes, 0, (width, height, width, height), out=boxes)
+            detections = Detections(boxes.astype(np.float32), detections.scores,
+                                    detections.class_ids, detections.class_names)
+            # Clipping flattens boxes outside the frame to zero width or height
+            inside = (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+            restored.append(detections if inside.all() else detections[inside])
+        return restored
+
+    def _reserve(self, count: int):
+        if count <= len(self._batch):
+            return
+        batch = np.full((count,) + self._batch.shape[1:], self.pad_value, dtype=np.uint8)
+        batch[:len(self._batch)] = self._batch
+        self._batch = batch
+        self._slot_shapes.extend([None] * (count - len(self._slot_shapes)))
@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+import numpy as np
+from typing import Any, Dict, Optional, Tuple
+
+from .yolo_sim import load_model
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _ModelEntry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.model = None
+        self.load_seconds = 0.0
+        self.memory_bytes: Optional[int] = None
+        self.warmup_seconds: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+        self.uses = 0
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models.
+
+    Each model is loaded once per (path, config) and the same instance is
+    handed to every caller. Loading is serialized per model, so concurrent
+    jobs asking for a model that isn't loaded yet wait for a single load
+    instead of each loading their own copy. The models themselves must be
+    safe to call from several threads. YOLOv8Simulator only keeps state
+    per caller stream (the accident in view, see predict()), so callers
+    sharing it, including the warm-up call, don't affect each other.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, Tuple], _ModelEntry] = {}
+
+    @staticmethod
+    def _key(model_path: str, config: Dict[str, Any]) -> Tuple[str, Tuple]:
+        return model_path, tuple(sorted(config.items()))
+
+    def get(self, model_path: str = "", **config):
+        """
+        Return the shared model for model_path and config, loading it on first use
+
+        Args:
+            model_path: Path to model weights
+            **config: Model constructor options; each distinct config is a separate model
+        """
+        key = self._key(model_path, config)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _ModelEntry()
+
+        with entry.lock:
+            if entry.model is None:
+                rss_before = _rss_bytes()
+                start = time.perf_counter()
+                entry.model = load_model(model_path, **config)
+                entry.load_seconds = time.perf_counter() - start
+                rss_after = _rss_bytes()
+                if rss_before is not None and rss_after is not None:
+                    entry.memory_bytes = max(0, rss_after - rss_before)
+                entry.loaded_at = time.time()
+            entry.uses += 1
+            return entry.model
+
+    def warm_up(self, model_path: str = "", size: Tuple[int, int] = (640, 640), **config):
+        """
+        Load a model and run one inference so the first real job doesn't pay for
+        lazy initialization
+
+        Args:
+            model_path: Path to model weights
+            size: (width, height) of the dummy frame used for the warm-up inference
+            **config: Model constructor options
+        """
+        model = self.get(model_path, **config)
+        entry = self._entries[self._key(model_path, config)]
+        start = time.perf_counter()
+        model.predict(np.zeros((size[1], size[0], 3), dtype=np.uint8))
+        entry.warmup_seconds = time.perf_counter() - start
+        return model
+
+    def stats(self):
+        """Load time, memory and usage of each loaded model"""
+        with self._lock:
+            items = list(self._entries.items())
+        stats = []
+        for (model_path, config), entry in items:
+            if entry.model is None:
+                continue
+            stats.append({
+                "path": model_path,
+                "config": dict(config),
+                "loadSeconds": round(entry.load_seconds, 4),
+                "warmupSeconds": round(entry.warmup_seconds, 4) if entry.warmup_seconds is not None else None,
+                "memoryBytes": entry.memory_bytes,
+                "uses": entry.uses,
+                "loadedAt": entry.loaded_at
+            })
+        return stats
+
+
+# Registry shared by everything in this process
+model_registry = ModelRegistry()
+
+
+def get_model(model_path: str = "", **config):
+    """Return the shared instance of a model from the process-wide registry"""
+    return model_registry.get(model_path, **config)
@@ -1,8 +1,28 @@
 import cv2
 import numpy as np
 import random
+import threading
 import time
-from typing import List, Dict, Any, Tuple
+import weakref
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+from .detections import Detections
+
+# Simulated inference cost: a fixed overhead per model call plus a cost per frame
+CALL_OVERHEAD_SECONDS = 0.08
+FRAME_COST_SECONDS = 0.02
+ACCIDENT_RATE = 0.02
+ACCIDENT_FRAMES = 8  # Consecutive frames a simulated accident stays visible
+
+# Latency models
+LATENCY_SLEEP = "sleep"  # time.sleep(), releasing the GIL like native/GPU inference
+LATENCY_CPU = "cpu"  # busy loop holding the GIL, like CPU-bound Python work
+LATENCY_PROPORTIONAL = "proportional"  # sleep, with the per-frame cost scaled by frame area
+LATENCY_NONE = "none"  # no simulated cost
+LATENCY_MODELS = (LATENCY_SLEEP, LATENCY_CPU, LATENCY_PROPORTIONAL, LATENCY_NONE)
+
+# Frame area the per-frame cost refers to in the proportional model
+REFERENCE_PIXELS = 640 * 640
 
 class YOLOv8Simulator:
     """
@@ -10,13 +30,38 @@ class YOLOv8Simulator:
     Since we can't install the actual ultralytics package, this simulates its behavior.
     """
     
-    def __init__(self, model_path: str = ""):
+    def __init__(self, model_path: str = "", seed: Optional[int] = None,
+                 latency: str = LATENCY_SLEEP, call_overhead: float = CALL_OVERHEAD_SECONDS,
+                 frame_cost: float = FRAME_COST_SECONDS, accident_rate: float = ACCIDENT_RATE,
+                 accident_frames: int = ACCIDENT_FRAMES):
         """
         Initialize a simulated YOLOv8 model
         
         Args:
             model_path: Path to a YOLOv8 model file (ignored in simulation)
+            seed: Seed for this model's detections (None for a random seed). Runs are
+                reproducible as long as frames reach the model in the same order
+            latency: How inference cost is simulated, one of LATENCY_MODELS
+            call_overhead: Fixed cost of each model call in seconds
+            frame_cost: Cost of each frame in seconds (per REFERENCE_PIXELS in the proportional model)
+            accident_rate: Probability that an accident starts on a frame
+            accident_frames: Frames an accident stays in view, moving slightly between frames
         """
+        if latency not in LATENCY_MODELS:
+            raise ValueError(f"Unknown latency model: {latency}")
+        self.seed = seed
+        self.latency = latency
+        self.call_overhead = call_overhead
+        self.frame_cost = frame_cost
+        self.accident_rate = accident_rate
+        self.accident_frames = max(1, accident_frames)
+        # (class id, box, frames left) of the accident in view on each
+        # caller's stream, keyed weakly by the stream object (see predict())
+        self._accidents = weakref.WeakKeyDictionary()
+        self._rng = random.Random(seed)
+        # Keeps each call's draws contiguous when threads share the model
+        self._rng_lock = threading.Lock()
+        
         self.classes = [
             "person", "bicycle", "car", "motorcycle", "bus", "truck",
             "traffic light", "fire hydrant", "stop sign", "vehicle collision",
@@ -24,109 +69,174 @@ class YOLOv8Simulator:
         ]
         
         self.accident_classes = ["vehicle collision", "person fall", "accident", "traffic accident"]
+        self.accident_class_ids = np.array([self.classes.index(name) for name in self.accident_classes], dtype=np.int32)
+        self._normal_class_ids = [i for i, name in enumerate(self.classes) if name not in self.accident_classes]
         self.confidence_threshold = 0.5
         self.initialized = True
         print(f"YOLOv8 model simulator initialized with {len(self.classes)} classes")
     
-    def predict(self, frame: np.ndarray, size: Tuple[int, int] = (640, 640)) -> List[Dict[str, Any]]:
+    def predict(self, frame: np.ndarray, size: Tuple[int, int] = (640, 640), stream: Any = None) -> Detections:
         """
         Simulate YOLOv8 prediction on a frame
         
+        A simulated accident stays in view for several frames of the video
+        it appeared in. Callers sharing the model tell their videos apart
+        with stream, so one caller's accident never shows up in another's
+        frames.
+        
         Args:
             frame: Input image (numpy array)
-            size: Input size for the model (ignored in simulation)
+            size: Model input size the frames were letterboxed to (see preprocess.py; unused in simulation)
+            stream: Object identifying the caller's video (e.g. its DetectionSession), held
+                weakly; None keeps no accident across calls
             
         Returns:
-            List of detection dictionaries with format:
-            [
-                {
-                    "class": class_index,
-                    "class_name": class_name,
-                    "confidence": confidence_score,
-                    "box": [x1, y1, x2, y2]  # in pixel coordinates
-                },
-                ...
-            ]
+            Detections with boxes as [x1, y1, x2, y2] in pixel coordinates
+            (use to_dicts() for the dict format)
+        """
+        return self.predict_batch([frame], size, stream)[0]
+    
+    def predict_batch(self, frames, size: Tuple[int, int] = (640, 640), stream: Any = None) -> List[Detections]:
         """
+        Simulate YOLOv8 prediction on a batch of frames
+        
+        The fixed per-call cost is paid once for the whole batch, as it is
+        for a real model running a stacked input tensor.
+        
+        Args:
+            frames: Stacked input images (N x H x W x 3 numpy array) or a list of frames
+            size: Model input size the frames were letterboxed to (see preprocess.py; unused in simulation)
+            stream: Video the frames come from, in order (see predict())
+            
+        Returns:
+            One Detections per frame, in the same format as predict()
+        """
+        if len(frames) == 0:
+            return []
+        
         # Simulate processing time
-        time.sleep(0.1)
+        self._simulate_cost(frames)
         
+        return self._simulate_detections(frames, stream)
+    
+    def _simulate_cost(self, frames):
+        """Spend the simulated inference time for one call on frames"""
+        if self.latency == LATENCY_NONE:
+            return
+        if self.latency == LATENCY_PROPORTIONAL:
+            pixels = sum(frame.shape[0] * frame.shape[1] for frame in frames)
+            seconds = self.call_overhead + self.frame_cost * pixels / REFERENCE_PIXELS
+        else:
+            seconds = self.call_overhead + self.frame_cost * len(frames)
+        
+        if self.latency == LATENCY_CPU:
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                pass
+        else:
+            time.sleep(seconds)
+    
+    def _simulate_detections(self, frames, stream: Any) -> List[Detections]:
+        """Create random detections for consecutive frames of a stream"""
+        with self._rng_lock:
+            accident = self._accidents.pop(stream, None) if stream is not None else None
+            results = []
+            for frame in frames:
+                detections, accident = self._draw_detections(frame, self._rng, accident)
+                results.append(detections)
+            if stream is not None and accident is not None:
+                self._accidents[stream] = accident
+            return results
+    
+    def _draw_detections(self, frame: np.ndarray, rng: random.Random,
+                         accident: Optional[Tuple]) -> Tuple[Detections, Optional[Tuple]]:
+        """
+        Draw the detections for one frame from rng
+        
+        Returns:
+            (detections, the accident still in view for the next frame or None)
+        """
         # Get frame dimensions
         height, width = frame.shape[:2]
         
-        # Create random detections
-        detections = []
+        # Always detect some normal objects (cars, people, etc.), and
+        # occasionally an accident (one extra row)
+        normal_object_count = rng.randint(1, 5)
+        boxes = np.empty((normal_object_count + 1, 4), dtype=np.float32)
+        scores = np.empty(normal_object_count + 1, dtype=np.float32)
+        class_ids = np.empty(normal_object_count + 1, dtype=np.int32)
         
-        # Always detect some normal objects (cars, people, etc.)
-        normal_object_count = random.randint(1, 5)
-        for _ in range(normal_object_count):
+        for i in range(normal_object_count):
             # Choose a random class that's not an accident
-            class_id = random.randint(0, len(self.classes) - 1)
-            while self.classes[class_id] in self.accident_classes:
-                class_id = random.randint(0, len(self.classes) - 1)
+            class_ids[i] = rng.choice(self._normal_class_ids)
             
             # Create random bounding box
-            x1 = random.randint(0, width - 100)
-            y1 = random.randint(0, height - 100)
-            box_width = random.randint(50, 200)
-            box_height = random.randint(50, 200)
-            x2 = min(width, x1 + box_width)
-            y2 = min(height, y1 + box_height)
+            x1 = rng.randint(0, width - 100)
+            y1 = rng.randint(0, height - 100)
+            boxes[i] = (x1, y1, min(width, x1 + rng.randint(50, 200)), min(height, y1 + rng.randint(50, 200)))
             
-            # Add detection with medium-high confidence
-            confidence = random.uniform(0.6, 0.9)
-            detections.append({
-                "class": class_id,
-                "class_name": self.classes[class_id],
-                "confidence": confidence,
-                "box": [x1, y1, x2, y2]
-            })
-        
-        # Occasionally detect an accident (2% chance)
-        if random.random() < 0.02:
+            # Medium-high confidence
+            scores[i] = rng.uniform(0.6, 0.9)
+        
+        count = normal_object_count
+        if accident is None and rng.random() < self.accident_rate:
             # Choose a random accident class
-            class_id = self.classes.index(random.choice(self.accident_classes))
+            class_id = rng.choice(self.accident_class_ids)
             
             # Create random bounding box for the accident
-            x1 = random.randint(0, width - 150)
-            y1 = random.randint(0, height - 150)
-            box_width = random.randint(100, 250)
-            box_height = random.randint(100, 250)
-            x2 = min(width, x1 + box_width)
-            y2 = min(height, y1 + box_height)
+            x1 = rng.randint(0, width - 150)
+            y1 = rng.randint(0, height - 150)
+            box = np.array((x1, y1, min(width, x1 + rng.randint(100, 250)), min(height, y1 + rng.randint(100, 250))),
+                           dtype=np.float32)
+            accident = (class_id, box, self.accident_frames)
+        
+        if accident is not None:
+            class_id, box, frames_left = accident
+            
+            # Drift the box a little from frame to frame
+            dx, dy = rng.randint(-8, 8), rng.randint(-8, 8)
+            box = np.clip(box + (dx, dy, dx, dy), 0, (width, height, width, height)).astype(np.float32)
+            accident = (class_id, box, frames_left - 1) if frames_left > 1 else None
             
-            # Add accident detection with high confidence
-            confidence = random.uniform(0.75, 0.98)
-            detections.append({
-                "class": class_id,
-                "class_name": self.classes[class_id],
-                "confidence": confidence,
-                "box": [x1, y1, x2, y2]
-            })
-        
-        return detections
+            boxes[count] = box
+            class_ids[count] = class_id
+            # Accident detections have high confidence
+            scores[count] = rng.uniform(0.75, 0.98)
+            count += 1
+        
+        return Detections(boxes[:count], scores[:count], class_ids[:count], self.classes), accident
     
-    def annotate_frame(self, frame: np.ndarray, detections: List[Dict[str, Any]]) -> np.ndarray:
+    def annotate_frame(self, frame: np.ndarray,
+                       detections: Union[Detections, List[Dict[str, Any]]],
+                       out: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Draw detection boxes and labels on the frame
         
         Args:
             frame: Original video frame
-            detections: List of detection dictionaries from predict()
+            detections: Detections from predict() (or a list of detection dicts)
+            out: Buffer of the frame's shape to draw into instead of a new copy;
+                pass the frame itself to draw in place
             
         Returns:
-            Annotated frame with bounding boxes and labels
+            Annotated frame with bounding boxes and labels (out, if given)
         """
-        annotated = frame.copy()
+        if not isinstance(detections, Detections):
+            detections = Detections.from_dicts(detections, self.classes)
+        if out is None:
+            annotated = frame.copy()
+        else:
+            if out is not frame:
+                np.copyto(out, frame)
+            annotated = out
         
-        for det in detections:
-            # Extract coordinates
-            x1, y1, x2, y2 = map(int, det["box"])
-            class_name = det["class_name"]
-            confidence = det["confidence"]
+        accident_mask = detections.class_mask(self.accident_class_ids)
+        boxes = detections.boxes.astype(np.int32)
+        for i in range(len(detections)):
+            x1, y1, x2, y2 = boxes[i].tolist()
             
             # Red color for accidents, green for other objects
-            if class_name in self.accident_classes:
+            if accident_mask[i]:
                 color = (0, 0, 255)  # Red for accidents
             else:
                 color = (0, 255, 0)  # Green for normal objects
@@ -135,27 +245,28 @@ class YOLOv8Simulator:
             cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
             
             # Add label with confidence
-            label = f"{class_name}: {confidence:.2f}"
+            label = f"{detections.name(i)}: {detections.scores[i]:.2f}"
             cv2.putText(annotated, label, (x1, y1 - 10),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-            
-            # Add accident warning if detected
-            if class_name in self.accident_classes:
-                cv2.putText(annotated, "ACCIDENT DETECTED", (10, 30),
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        
+        # Add accident warning if detected
+        if accident_mask.any():
+            cv2.putText(annotated, "ACCIDENT DETECTED", (10, 30),
+                       cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
         
         return annotated
 
 # Function to simulate YOLO model loading
-def load_model(model_path: str = ""):
+def load_model(model_path: str = "", **config):
     """
     Simulate loading a YOLOv8 model
     
     Args:
         model_path: Path to model weights (ignored in simulation)
+        **config: Additional YOLOv8Simulator options
         
     Returns:
         A YOLOv8Simulator instance
     """
     print(f"Loading YOLOv8 model (simulated): {model_path}")
-    return YOLOv8Simulator(model_path)
\ No newline at end of file
+    return YOLOv8Simulator(model_path, **config)
\ No newline at end of file
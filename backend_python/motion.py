@@ -0,0 +1,88 @@
+import cv2
+import numpy as np
+from typing import Any, Dict, Optional
+
+
+class MotionGate:
+    """
+    Cheap pre-filter that decides whether a frame changed enough to be
+    worth running the detector on.
+
+    Frames are downscaled to a small grayscale image and compared with a
+    running-average background; the frame passes when the fraction of
+    pixels that differ from the background by more than pixel_threshold
+    reaches min_changed_fraction. The background adapts slowly, so lighting
+    drift doesn't count as motion. Every max_skipped consecutive skipped
+    frames one frame is let through anyway, so a scene that stops moving
+    (e.g. vehicles at rest after a collision) is still looked at.
+    """
+
+    def __init__(self, width: int = 160, pixel_threshold: int = 25,
+                 min_changed_fraction: float = 0.005, learning_rate: float = 0.05,
+                 max_skipped: int = 20):
+        """
+        Initialize the gate
+
+        Args:
+            width: Width the frame is downscaled to before comparison
+            pixel_threshold: Grayscale difference (0-255) that counts a pixel as changed
+            min_changed_fraction: Fraction of changed pixels needed to pass the frame
+            learning_rate: Weight of each new frame in the running background
+            max_skipped: Consecutive skipped frames after which one frame is passed regardless (0 = never)
+        """
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.learning_rate = learning_rate
+        self.max_skipped = max_skipped
+
+        self._background: Optional[np.ndarray] = None
+        self._small: Optional[np.ndarray] = None
+        self._gray: Optional[np.ndarray] = None
+        self._diff: Optional[np.ndarray] = None
+        self._skipped_run = 0
+        self.last_changed_fraction = 0.0
+        self.frames_checked = 0
+        self.frames_skipped = 0
+        self.frames_forced = 0
+
+    def check(self, frame: np.ndarray) -> bool:
+        """True if the frame should go to the detector"""
+        self.frames_checked += 1
+        height = max(1, round(frame.shape[0] * self.width / frame.shape[1]))
+        if self._small is None or self._small.shape[:2] != (height, self.width):
+            # First frame or the resolution changed: start a new background
+            self._small = np.empty((height, self.width, 3), dtype=np.uint8)
+            self._gray = np.empty((height, self.width), dtype=np.uint8)
+            self._diff = np.empty((height, self.width), dtype=np.float32)
+            self._background = None
+
+        cv2.resize(frame, (self.width, height), dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        if self._background is None:
+            self._background = self._gray.astype(np.float32)
+            self._skipped_run = 0
+            return True
+
+        cv2.absdiff(self._gray.astype(np.float32), self._background, dst=self._diff)
+        self.last_changed_fraction = float(np.count_nonzero(self._diff > self.pixel_threshold)) / self._diff.size
+        cv2.accumulateWeighted(self._gray, self._background, self.learning_rate)
+
+        if self.last_changed_fraction >= self.min_changed_fraction:
+            self._skipped_run = 0
+            return True
+        if self.max_skipped and self._skipped_run >= self.max_skipped:
+            self._skipped_run = 0
+            self.frames_forced += 1
+            return True
+        self._skipped_run += 1
+        self.frames_skipped += 1
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "framesChecked": self.frames_checked,
+            "framesSkipped": self.frames_skipped,
+            "framesForced": self.frames_forced,
+            "lastChangedFraction": round(self.last_changed_fraction, 4)
+        }
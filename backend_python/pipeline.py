@@ -0,0 +1,199 @@
+import queue
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the stream on a stage queue
+_END = object()
+
+
+class _StageError:
+    """Carries an exception raised in a stage thread to the consumer"""
+
+    def __init__(self, stage: str, error: BaseException):
+        self.stage = stage
+        self.error = error
+
+
+class StageStats:
+    """
+    Timing of one pipeline stage.
+
+    busy_seconds is time spent doing the stage's work; wait_seconds is time
+    spent blocked on the input queue (starved) or the output queue (backpressure).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "busySeconds": round(self.busy_seconds, 4),
+            "waitSeconds": round(self.wait_seconds, 4),
+            "avgMs": round(1000 * self.busy_seconds / self.items, 2) if self.items else 0.0
+        }
+
+
+class StagedPipeline:
+    """
+    Runs a source and a chain of stages in their own threads, connected by
+    bounded queues, and yields the last stage's output to the caller.
+
+    The caller's loop is the final (sink) stage and is timed as such. Bounded
+    queues give backpressure: a fast decoder blocks instead of buffering the
+    whole video while inference catches up.
+
+    Example:
+        pipeline = StagedPipeline(
+            ("decode", sampler),
+            [("inference", run_model)],
+            queue_depths=[4, 4],
+            sink_name="encode")
+        for item in pipeline:
+            write(item)
+    """
+
+    def __init__(self, source: Tuple[str, Iterable[Any]],
+                 stages: Sequence[Tuple[str, Callable[[Any], Any]]],
+                 queue_depths: Sequence[int] = (), sink_name: str = "sink"):
+        """
+        Initialize the pipeline
+
+        Args:
+            source: (name, iterable) producing the input items
+            stages: (name, function) pairs applied in order to each item
+            queue_depths: Capacity of the queue after the source and after each stage
+                (missing entries default to 4)
+            sink_name: Name under which the caller's loop is timed
+        """
+        self.source = source
+        self.stages = list(stages)
+        depths = list(queue_depths) + [4] * (len(self.stages) + 1 - len(queue_depths))
+        self._queues = [queue.Queue(maxsize=max(1, depth)) for depth in depths[:len(self.stages) + 1]]
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        names = [source[0]] + [name for name, _ in self.stages] + [sink_name]
+        self.stats: Dict[str, StageStats] = {name: StageStats(name) for name in names}
+        self._sink_stats = self.stats[sink_name]
+
+    def __iter__(self) -> Iterator[Any]:
+        self._start()
+        output = self._queues[-1]
+        try:
+            while True:
+                start = time.perf_counter()
+                item = output.get()
+                self._sink_stats.wait_seconds += time.perf_counter() - start
+
+                if item is _END:
+                    return
+                if isinstance(item, _StageError):
+                    raise item.error
+
+                start = time.perf_counter()
+                yield item
+                self._sink_stats.busy_seconds += time.perf_counter() - start
+                self._sink_stats.items += 1
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop all stage threads (safe to call more than once)"""
+        self._stop.set()
+        # Drain queues so producers blocked on put() can observe the stop flag
+        for q in self._queues:
+            try:
+                while True:
+                    q.get_nowait()
+            except queue.Empty:
+                pass
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def stats_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {name: stats.to_dict() for name, stats in self.stats.items()}
+
+    def queue_depths(self) -> List[int]:
+        """Current number of items waiting in each queue"""
+        return [q.qsize() for q in self._queues]
+
+    # Internal helpers
+
+    def _start(self):
+        name, iterable = self.source
+        self._threads.append(threading.Thread(
+            target=self._run_source, args=(name, iterable, self._queues[0]),
+            name=f"pipeline-{name}", daemon=True))
+        for i, (name, fn) in enumerate(self.stages):
+            self._threads.append(threading.Thread(
+                target=self._run_stage, args=(name, fn, self._queues[i], self._queues[i + 1]),
+                name=f"pipeline-{name}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def _put(self, q: queue.Queue, item: Any, stats: StageStats) -> bool:
+        start = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            stats.wait_seconds += time.perf_counter() - start
+
+    def _run_source(self, name: str, iterable: Iterable[Any], output: queue.Queue):
+        stats = self.stats[name]
+        try:
+            iterator = iter(iterable)
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stats.busy_seconds += time.perf_counter() - start
+                stats.items += 1
+                if not self._put(output, item, stats):
+                    return
+            self._put(output, _END, stats)
+        except Exception as e:
+            logger.exception(f"Pipeline stage {name} failed")
+            self._put(output, _StageError(name, e), stats)
+
+    def _run_stage(self, name: str, fn: Callable[[Any], Any], inbox: queue.Queue, output: queue.Queue):
+        stats = self.stats[name]
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                try:
+                    item = inbox.get(timeout=0.1)
+                except queue.Empty:
+                    stats.wait_seconds += time.perf_counter() - start
+                    continue
+                stats.wait_seconds += time.perf_counter() - start
+
+                if item is _END or isinstance(item, _StageError):
+                    # Pass end-of-stream and upstream errors through
+                    self._put(output, item, stats)
+                    return
+
+                start = time.perf_counter()
+                result = fn(item)
+                stats.busy_seconds += time.perf_counter() - start
+                stats.items += 1
+                if not self._put(output, result, stats):
+                    return
+        except Exception as e:
+            logger.exception(f"Pipeline stage {name} failed")
+            self._put(output, _StageError(name, e), stats)
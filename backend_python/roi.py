@@ -0,0 +1,79 @@
+import cv2
+import numpy as np
+from typing import Dict, List, Sequence, Tuple
+
+from models.detections import Detections
+
+
+class _Geometry:
+    """ROI polygon rasterized for one frame size"""
+
+    def __init__(self, polygon: np.ndarray, height: int, width: int):
+        points = np.round(polygon * (width - 1, height - 1)).astype(np.int32)
+        x0, y0 = points.min(axis=0)
+        x1, y1 = points.max(axis=0) + 1
+        self.x0, self.y0, self.x1, self.y1 = int(x0), int(y0), int(x1), int(y1)
+        self.offset = np.array((x0, y0, x0, y0), dtype=np.float32)
+        # Inside-polygon mask of the crop
+        self.mask = np.zeros((self.y1 - self.y0, self.x1 - self.x0), dtype=bool)
+        filled = np.zeros(self.mask.shape, dtype=np.uint8)
+        cv2.fillPoly(filled, [points - (x0, y0)], 1)
+        self.mask[:] = filled.astype(bool)
+
+
+class RegionOfInterest:
+    """
+    A camera's region of interest: a polygon in normalized coordinates
+    (x and y as fractions of the frame width and height), so it holds for
+    any resolution the camera delivers.
+
+    Inference runs on the polygon's bounding box, cut out of the frame as a
+    view (no copy). Detections are mapped back to frame coordinates, and
+    those whose ground point (bottom center of the box) is outside the
+    polygon are dropped.
+    """
+
+    def __init__(self, polygon: Sequence[Sequence[float]]):
+        """
+        Args:
+            polygon: At least three [x, y] points with coordinates in 0..1
+
+        Raises:
+            ValueError: If the polygon is malformed
+        """
+        try:
+            points = np.asarray(polygon, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError("ROI must be a list of at least three [x, y] points")
+        if points.ndim != 2 or points.shape[1] != 2 or len(points) < 3:
+            raise ValueError("ROI must be a list of at least three [x, y] points")
+        if not np.isfinite(points).all() or points.min() < 0 or points.max() > 1:
+            raise ValueError("ROI coordinates must be fractions of the frame size between 0 and 1")
+        self.polygon = points
+        self._geometry: Dict[Tuple[int, int], _Geometry] = {}
+
+    def to_list(self) -> List[List[float]]:
+        return self.polygon.tolist()
+
+    def geometry(self, height: int, width: int) -> _Geometry:
+        geometry = self._geometry.get((height, width))
+        if geometry is None:
+            geometry = self._geometry[(height, width)] = _Geometry(self.polygon, height, width)
+        return geometry
+
+    def crop(self, images: np.ndarray) -> np.ndarray:
+        """View of the ROI's bounding box in a frame (H x W x 3) or a stacked batch (N x H x W x 3)"""
+        g = self.geometry(*images.shape[-3:-1])
+        return images[..., g.y0:g.y1, g.x0:g.x1, :]
+
+    def to_frame(self, detections: Detections, frame_shape: Tuple[int, ...]) -> Detections:
+        """Map detections on a crop back to frame coordinates, keeping those inside the polygon"""
+        if not len(detections):
+            return detections
+        g = self.geometry(*frame_shape[:2])
+        height, width = g.mask.shape
+        cx = np.clip(((detections.boxes[:, 0] + detections.boxes[:, 2]) / 2).astype(np.int32), 0, width - 1)
+        cy = np.clip(detections.boxes[:, 3].astype(np.int32), 0, height - 1)
+        inside = g.mask[cy, cx]
+        kept = detections[inside]
+        return Detections(kept.boxes + g.offset, kept.scores, kept.class_ids, kept.class_names)
@@ -1,4 +1,7 @@
-from app import app
-
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001)
\ No newline at end of file
+    # Imported here rather than at the top: spawned shard worker processes
+    # re-run this script on start and must not build the server's state
+    from app import app, start_services
+
+    start_services()
+    app.run(host='0.0.0.0', port=5001)
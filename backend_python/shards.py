@@ -0,0 +1,113 @@
+import math
+import logging
+
+import cv2
+
+from config import (
+    CLIP_ENCODER_WORKERS, CLIP_POST_ROLL_SECONDS, CLIP_PRE_ROLL_SECONDS, INCIDENT_CONFIRM_WINDOW,
+    INFERENCE_BATCH_SIZE, MODEL_CONFIG, MODEL_NAME, SAMPLING_MODE, VIDEO_SHARD_MIN_SECONDS, VIDEO_SHARDS
+)
+from models.registry import get_model, model_registry
+from video_source import FrameSampler
+from clips import ClipEncoder
+from roi import RegionOfInterest
+from detection import DetectionSession, create_frame_pool, run_detection
+from metrics import StageTimer, pipeline_counters
+
+# Video shards run in worker processes that only import this module (and
+# the detection pipeline), never app.py, so they don't build or start any
+# of the server's services.
+
+logger = logging.getLogger(__name__)
+
+# Encodes the shard's incident clips; created by init_shard_worker
+clip_encoder = None
+
+
+def shard_count(total_frames, fps):
+    """Number of shards to split a video into: VIDEO_SHARDS at most, each at least VIDEO_SHARD_MIN_SECONDS long"""
+    if VIDEO_SHARDS <= 1 or not fps or fps <= 0 or total_frames <= 0:
+        return 1
+    return max(1, min(VIDEO_SHARDS, int(total_frames / fps // VIDEO_SHARD_MIN_SECONDS)))
+
+def shard_bounds(total_frames, interval, shards):
+    """
+    Split a video's frames into contiguous ranges
+
+    Returns:
+        (after, until) frame numbers per shard; shard i owns frames after < n <= until.
+        Boundaries fall on multiples of interval so every shard samples the
+        same frames a single pass would.
+    """
+    edges = [round(total_frames * i / shards / interval) * interval for i in range(shards)] + [total_frames]
+    return [(edges[i], edges[i + 1]) for i in range(shards) if edges[i] < edges[i + 1]]
+
+def init_shard_worker():
+    """Set up a shard worker process: logging, the clip encoder and the model"""
+    global clip_encoder
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    clip_encoder = ClipEncoder(max_workers=CLIP_ENCODER_WORKERS)
+    model_registry.warm_up(MODEL_NAME, **MODEL_CONFIG)
+
+def run_video_shard(video_path, camera_id, after, until, interval, roi_polygon):
+    """
+    Process one time range of a video in a shard worker process
+
+    The shard starts reading early enough to fill the tracker's confirmation
+    window and the clip pre-roll, and reads past its end for the clip
+    post-roll, but only raises incidents confirmed on its own frames.
+    Incidents are returned undebounced and with provisional file names
+    rather than published, since ids and camera state belong to the
+    server process.
+
+    Args:
+        video_path: Path of the video file
+        camera_id: Camera the video is attributed to
+        after: The shard owns frames after < n <= until
+        until: See after
+        interval: Source frames per processed frame
+        roi_polygon: Region of interest of the camera, or None
+
+    Returns:
+        The shard's summary, including its incidents and pipeline counter totals
+    """
+    counters_before = pipeline_counters.totals()
+    yolo_model = get_model(MODEL_NAME, **MODEL_CONFIG)
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Error opening video file: {video_path}")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        lead = interval * max(INCIDENT_CONFIRM_WINDOW, math.ceil(CLIP_PRE_ROLL_SECONDS * fps / interval))
+        tail = interval * math.ceil(CLIP_POST_ROLL_SECONDS * fps / interval)
+
+        timer = StageTimer(camera=camera_id)
+        # Every confirmed incident is returned: debouncing happens once, across
+        # all shards, when the server merges them
+        session = DetectionSession(camera_id, yolo_model, fps, clip_encoder, interval, timer,
+                                   report_range=(after, until), min_incident_interval=0)
+        sampler = FrameSampler(cap, interval, INFERENCE_BATCH_SIZE, SAMPLING_MODE, timer,
+                               start_frame=max(0, after - lead), end_frame=until + tail,
+                               pool=create_frame_pool(cap, INFERENCE_BATCH_SIZE))
+        roi = RegionOfInterest(roi_polygon) if roi_polygon else None
+        gate, pipeline = run_detection(session, sampler, lambda: roi, timer)
+    finally:
+        cap.release()
+    # The clips must be written before the results go back to the server
+    for future in session.clips:
+        future.result()
+
+    counters = pipeline_counters.totals()
+    return {
+        "after": after,
+        "until": until,
+        "framesDecoded": sampler.frames_decoded,
+        "framesRetrieved": sampler.frames_retrieved,
+        "samplingMode": sampler.mode,
+        "framesInferred": session.inferred_frames,
+        "incidents": session.incidents,
+        "tracking": session.tracker.stats(),
+        "motion": gate.stats() if gate is not None else None,
+        "stages": pipeline.stats_dict(),
+        "counters": {name: counters[name] - counters_before.get(name, 0) for name in counters}
+    }
@@ -0,0 +1,59 @@
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class CameraRegistry:
+    """
+    Camera records shared by the detection workers and the API handlers.
+
+    Records are copy-on-write: an update builds a new record under that
+    camera's lock and swaps it in, so readers always see a consistent
+    record without taking a lock (and never hold up the workers), and
+    updates to different cameras don't contend. Records handed out are
+    shared and must be treated as read-only.
+    """
+
+    def __init__(self, cameras: Iterable[Dict[str, Any]]):
+        """
+        Args:
+            cameras: Initial camera records, each with an "id"
+        """
+        self._records: Dict[str, Dict[str, Any]] = {camera["id"]: dict(camera) for camera in cameras}
+        self._locks = {camera_id: threading.Lock() for camera_id in self._records}
+
+    def __contains__(self, camera_id: str) -> bool:
+        return camera_id in self._records
+
+    def __getitem__(self, camera_id: str) -> Dict[str, Any]:
+        return self._records[camera_id]
+
+    def get(self, camera_id: str) -> Optional[Dict[str, Any]]:
+        return self._records.get(camera_id)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Current records of all cameras"""
+        return list(self._records.values())
+
+    def update(self, camera_id: str, expect: Optional[Dict[str, Any]] = None,
+               **fields) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Update a camera's fields atomically
+
+        Args:
+            camera_id: Camera to update
+            expect: Field values the record must currently have for the update to apply
+            **fields: New field values
+
+        Returns:
+            (previous record, updated record), or None if expect didn't match
+
+        Raises:
+            KeyError: If the camera doesn't exist
+        """
+        with self._locks[camera_id]:
+            previous = self._records[camera_id]
+            if expect and any(previous.get(key) != value for key, value in expect.items()):
+                return None
+            updated = dict(previous, **fields)
+            self._records[camera_id] = updated
+        return previous, updated
@@ -0,0 +1,307 @@
+import json
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Mirrors the incidents table in shared/schema.ts, except that camera ids are
+# the Python backend's string ids and the extra detail fields are kept as JSON
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    id INTEGER PRIMARY KEY,
+    camera_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    type TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    location TEXT NOT NULL,
+    detections TEXT,
+    image_url TEXT,
+    video_url TEXT,
+    details TEXT,
+    reviewed INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_incidents_camera_id ON incidents (camera_id, id);
+CREATE INDEX IF NOT EXISTS idx_incidents_timestamp ON incidents (timestamp);
+CREATE INDEX IF NOT EXISTS idx_incidents_type ON incidents (type, id);
+CREATE INDEX IF NOT EXISTS idx_incidents_severity ON incidents (severity, id);
+"""
+
+COLUMNS = ("id", "camera_id", "timestamp", "type", "severity", "location",
+           "detections", "image_url", "video_url", "details")
+
+# API field name -> column it is read from
+FIELD_COLUMNS = {
+    "id": "id",
+    "cameraId": "camera_id",
+    "location": "location",
+    "timestamp": "timestamp",
+    "timeAgo": "timestamp",
+    "type": "type",
+    "severity": "severity",
+    "imageUrl": "image_url",
+    "videoUrl": "video_url",
+    "detections": "detections",
+    "details": "details"
+}
+FIELDS = tuple(FIELD_COLUMNS)
+JSON_COLUMNS = ("detections", "details")
+
+MAX_PAGE_SIZE = 500
+
+
+def time_ago(timestamp: str, now: Optional[datetime] = None) -> str:
+    """Human readable age of an ISO timestamp, e.g. "5 minutes ago" """
+    try:
+        seconds = ((now or datetime.now()) - datetime.fromisoformat(timestamp)).total_seconds()
+    except ValueError:
+        return ""
+    if seconds < 60:
+        return "just now"
+    for unit, size in (("day", 86400), ("hour", 3600), ("minute", 60)):
+        if seconds >= size:
+            count = int(seconds // size)
+            return f"{count} {unit}{'s' if count != 1 else ''} ago"
+    return "just now"
+
+
+class IncidentStore:
+    """
+    SQLite-backed incident storage.
+
+    Each thread gets its own connection (sqlite3 connections can't be shared
+    across threads), and the database runs in WAL mode so API readers don't
+    block on detection workers writing. Writes from detection workers are
+    buffered and inserted in batches by a background flusher; reads flush
+    the buffer first so a newly added incident is always visible.
+
+    The store assigns incident ids as incidents are added, in the order
+    they are buffered and inserted, so incidents become visible in id
+    order and polling with since= can't skip one.
+    """
+
+    def __init__(self, path: str, batch_size: int = 50, flush_interval: float = 0.5):
+        """
+        Initialize the store, creating the schema if needed
+
+        Args:
+            path: SQLite database file
+            batch_size: Buffered incidents that trigger an immediate flush
+            flush_interval: Maximum seconds an incident stays buffered
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._local = threading.local()
+        self._buffer: List[tuple] = []
+        self._buffer_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+        # Ids continue from the last stored incident
+        self._next_id = self.max_id() + 1
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="incident-store-flush", daemon=True)
+        self._flusher.start()
+
+    def add(self, build: Callable[[int], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Give a new incident the next id and buffer it for insertion
+
+        Args:
+            build: Called with the id (under the buffer lock, so keep it
+                cheap); returns the incident in the API format
+
+        Returns:
+            The incident
+        """
+        with self._buffer_lock:
+            incident = build(self._next_id)
+            self._buffer.append(self._to_row(incident))
+            self._next_id += 1
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+        return incident
+
+    def flush(self):
+        """Insert all buffered incidents in one transaction"""
+        with self._write_lock:
+            with self._buffer_lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return
+            conn = self._conn()
+            try:
+                with conn:
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO incidents ({', '.join(COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+            except sqlite3.Error as e:
+                logger.error(f"Error writing {len(rows)} incidents: {e}")
+                with self._buffer_lock:
+                    self._buffer = rows + self._buffer
+
+    def get(self, incident_id: int) -> Optional[Dict[str, Any]]:
+        self._flush_pending()
+        row = self._conn().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM incidents WHERE id = ?", (incident_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """All incidents, oldest first"""
+        self._flush_pending()
+        rows = self._conn().execute(f"SELECT {', '.join(COLUMNS)} FROM incidents ORDER BY id").fetchall()
+        now = datetime.now()
+        return [self._to_dict(row, now) for row in rows]
+
+    def query(self, limit: int = 50, cursor: Optional[int] = None, since: Optional[int] = None,
+              camera_ids: Sequence[str] = (), types: Sequence[str] = (), severities: Sequence[str] = (),
+              start: Optional[str] = None, end: Optional[str] = None,
+              fields: Optional[Sequence[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Fetch one page of incidents using keyset pagination on id
+
+        Pages are newest first and continue with id < cursor. With since,
+        only incidents newer than that id are returned, oldest first, so a
+        client can poll for just what it hasn't seen.
+
+        Args:
+            limit: Page size (capped at MAX_PAGE_SIZE)
+            cursor: Return incidents older than this id (the previous page's next cursor)
+            since: Return incidents newer than this id instead, oldest first
+            camera_ids: Only these cameras
+            types: Only these incident types
+            severities: Only these severities
+            start: Only incidents with timestamp >= start (ISO format)
+            end: Only incidents with timestamp < end (ISO format)
+            fields: API fields to include (default all)
+
+        Returns:
+            (incidents, next_cursor); next_cursor is None on the last page
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        fields = [f for f in (fields or FIELDS) if f in FIELD_COLUMNS] or list(FIELDS)
+        columns = list(dict.fromkeys(["id"] + [FIELD_COLUMNS[f] for f in fields]))
+
+        where = []
+        params: List[Any] = []
+        if since is not None:
+            where.append("id > ?")
+            params.append(since)
+            order = "ASC"
+        else:
+            if cursor is not None:
+                where.append("id < ?")
+                params.append(cursor)
+            order = "DESC"
+        for column, values in (("camera_id", camera_ids), ("type", types), ("severity", severities)):
+            if values:
+                where.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        if start:
+            where.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            where.append("timestamp < ?")
+            params.append(end)
+
+        sql = f"SELECT {', '.join(columns)} FROM incidents"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # Fetch one extra row to learn whether there is another page
+        sql += f" ORDER BY id {order} LIMIT ?"
+        params.append(limit + 1)
+
+        self._flush_pending()
+        rows = self._conn().execute(sql, params).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        now = datetime.now()
+        incidents = []
+        for row in rows:
+            values = dict(zip(columns, row))
+            incident = {}
+            for field in fields:
+                value = values[FIELD_COLUMNS[field]]
+                if field == "id":
+                    value = str(value)
+                elif field == "timeAgo":
+                    value = time_ago(value, now)
+                elif field in JSON_COLUMNS:
+                    value = json.loads(value) if value else ([] if field == "detections" else {})
+                incident[field] = value
+            incidents.append(incident)
+
+        next_cursor = rows[-1][0] if has_more else None
+        return incidents, next_cursor
+
+    def count(self) -> int:
+        self._flush_pending()
+        return self._conn().execute("SELECT COUNT(*) FROM incidents").fetchone()[0]
+
+    def max_id(self) -> int:
+        self._flush_pending()
+        return self._conn().execute("SELECT COALESCE(MAX(id), 0) FROM incidents").fetchone()[0]
+
+    # Internal helpers
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _flush_pending(self):
+        # Taking the write lock also waits out a flush already in progress
+        self.flush()
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    @staticmethod
+    def _to_row(incident: Dict[str, Any]) -> tuple:
+        return (
+            int(incident["id"]),
+            incident["cameraId"],
+            incident["timestamp"],
+            incident["type"],
+            incident["severity"],
+            incident["location"],
+            json.dumps(incident.get("detections", [])),
+            incident.get("imageUrl"),
+            incident.get("videoUrl"),
+            json.dumps(incident.get("details", {}))
+        )
+
+    @staticmethod
+    def _to_dict(row, now: Optional[datetime] = None) -> Dict[str, Any]:
+        (incident_id, camera_id, timestamp, incident_type, severity, location,
+         detections, image_url, video_url, details) = row
+        return {
+            "id": str(incident_id),
+            "cameraId": camera_id,
+            "location": location,
+            "timestamp": timestamp,
+            "timeAgo": time_ago(timestamp, now),
+            "type": incident_type,
+            "severity": severity,
+            "imageUrl": image_url,
+            "videoUrl": video_url,
+            "detections": json.loads(detections) if detections else [],
+            "details": json.loads(details) if details else {}
+        }
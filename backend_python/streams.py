@@ -0,0 +1,341 @@
+import cv2
+import numpy as np
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from framepool import FramePool
+from governor import LatencyGovernor
+from metrics import StageTimer, pipeline_counters
+
+logger = logging.getLogger(__name__)
+
+# Frame rate assumed for sources that don't report one
+DEFAULT_STREAM_FPS = 25.0
+
+
+class CameraStream:
+    """
+    Long-lived ingestion worker for one live camera.
+
+    A reader thread pulls frames from the source as fast as the source
+    delivers them and keeps only the most recent one. A processing thread
+    takes the latest frame whenever it is free, so when inference falls
+    behind, stale frames are dropped instead of queueing up and adding
+    latency. With a governor, the reader only decodes the frames the
+    governor samples and grab()s past the rest. Lost or unreachable
+    sources are reopened with exponential backoff.
+
+    Frames are decoded into a small FramePool (one slot being decoded, one
+    waiting as the latest frame, one being processed), so a long-running
+    stream allocates no frame memory per frame.
+
+    Any cv2.VideoCapture source works: RTSP/HTTP URLs, device indices, or
+    local files (optionally looped and paced at their native frame rate to
+    stand in for a live camera).
+    """
+
+    def __init__(self, camera_id: str, source: Any,
+                 process_frame: Callable[[int, Any, float], None],
+                 on_status: Optional[Callable[[str, str], None]] = None,
+                 on_stop: Optional[Callable[[], None]] = None,
+                 governor: Optional[LatencyGovernor] = None,
+                 loop: bool = False, realtime: Optional[bool] = None,
+                 reconnect_initial: float = 1.0, reconnect_max: float = 30.0, pool_slots: int = 3):
+        """
+        Initialize the stream worker
+
+        Args:
+            camera_id: Camera this stream belongs to
+            source: Anything cv2.VideoCapture accepts (URL, file path or device index)
+            process_frame: Called as process_frame(frame_number, frame, fps) for each frame processed
+            on_status: Called as on_status(camera_id, status) when the connection state changes
+            on_stop: Called once when the worker stops
+            governor: Adapts the sampling interval to hold a latency budget (None processes the newest frame whenever free)
+            loop: Rewind file sources at the end instead of treating it as a disconnect
+            realtime: Pace reads at the source frame rate (defaults to True for local files)
+            reconnect_initial: First reconnect delay in seconds
+            reconnect_max: Maximum reconnect delay in seconds
+            pool_slots: Frame pool slots (0 decodes each frame into a new array)
+        """
+        self.camera_id = camera_id
+        self.source = source
+        self.process_frame = process_frame
+        self.on_status = on_status
+        self.on_stop = on_stop
+        self.governor = governor
+        self.loop = loop
+        is_file = isinstance(source, str) and "://" not in source
+        self.realtime = is_file if realtime is None else realtime
+        self.reconnect_initial = reconnect_initial
+        self.reconnect_max = reconnect_max
+        self.pool_slots = pool_slots
+        # Created once the frame size is known, and again if it changes
+        self._pool: Optional[FramePool] = None
+
+        self.status = "stopped"
+        self.fps = DEFAULT_STREAM_FPS
+        self.timer = StageTimer(camera=camera_id)
+
+        # Latest frame slot shared between the reader and processing threads
+        self._cond = threading.Condition()
+        self._latest = None
+        # (pool, slot) holding the latest frame, or None
+        self._latest_lease = None
+        self._latest_number = 0
+        self._latest_time = 0.0
+        self._consumed_number = 0
+
+        self._stop = threading.Event()
+        self._reader: Optional[threading.Thread] = None
+        self._processor: Optional[threading.Thread] = None
+
+        # Counters
+        self.frames_read = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.reconnects = 0
+        self.last_frame_age = 0.0
+        self.last_process_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        if self._reader is not None:
+            return
+        self._stop.clear()
+        self._reader = threading.Thread(target=self._read_loop, name=f"stream-read-{self.camera_id}", daemon=True)
+        self._processor = threading.Thread(target=self._process_loop, name=f"stream-proc-{self.camera_id}", daemon=True)
+        self._reader.start()
+        self._processor.start()
+        logger.info(f"Started stream for camera {self.camera_id}: {self.source}")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in (self._reader, self._processor):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout)
+        self._reader = None
+        self._processor = None
+        self._release(self._latest_lease)
+        self._latest = self._latest_lease = None
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+        self._set_status("stopped")
+        logger.info(f"Stopped stream for camera {self.camera_id}")
+
+    @property
+    def running(self) -> bool:
+        return self._reader is not None and not self._stop.is_set()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "cameraId": self.camera_id,
+            "source": str(self.source),
+            "status": self.status,
+            "fps": self.fps,
+            "framesRead": self.frames_read,
+            "framesProcessed": self.frames_processed,
+            "framesDropped": self.frames_dropped,
+            "reconnects": self.reconnects,
+            "lastFrameAgeMs": round(1000 * self.last_frame_age, 1),
+            "lastProcessMs": round(1000 * self.last_process_seconds, 1),
+            "lastError": self.last_error
+        }
+        if self.governor is not None:
+            stats["governor"] = self.governor.stats()
+        pool = self._pool
+        if pool is not None:
+            stats["framePool"] = pool.stats()
+        return stats
+
+    # Internal helpers
+
+    def _set_status(self, status: str):
+        if status == self.status:
+            return
+        self.status = status
+        if self.on_status:
+            self.on_status(self.camera_id, status)
+
+    def _open(self) -> Optional[cv2.VideoCapture]:
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 else DEFAULT_STREAM_FPS
+        return cap
+
+    def _read_loop(self):
+        delay = self.reconnect_initial
+        while not self._stop.is_set():
+            self._set_status("connecting")
+            cap = self._open()
+            if cap is None:
+                self.last_error = "Unable to open source"
+                self._set_status("offline")
+                logger.warning(f"Camera {self.camera_id}: unable to open {self.source}, retrying in {delay:.1f}s")
+                self._stop.wait(delay)
+                delay = min(self.reconnect_max, delay * 2)
+                self.reconnects += 1
+                continue
+
+            self._set_status("monitoring")
+            frame_period = 1.0 / self.fps
+            next_due = time.monotonic()
+            got_frame = False
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                if not cap.grab():
+                    if self.loop and got_frame and cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                        continue
+                    break
+
+                got_frame = True
+                delay = self.reconnect_initial
+                self.frames_read += 1
+                pipeline_counters.add("framesDecoded")
+                
+                # Only decode the frames that will be offered for processing
+                if self.governor is None or self.governor.should_sample():
+                    pool = self._pool
+                    slot = pool.acquire() if pool is not None else None
+                    out = pool.view(slot)[0] if pool is not None else None
+                    ret, frame = cap.retrieve(out)
+                    if pool is not None and not (ret and np.shares_memory(frame, out)):
+                        pool.release(slot)
+                        if ret:
+                            # The resolution changed; the next frames go to a new pool
+                            pool.close()
+                            self._pool = pool = None
+                    if ret:
+                        if self._pool is None and self.pool_slots > 0:
+                            self._pool = FramePool(frame.shape, self.pool_slots)
+                        self.timer.observe("read", time.perf_counter() - start)
+                        self._publish(frame, (pool, slot) if pool is not None else None)
+
+                if self.realtime:
+                    next_due += frame_period
+                    sleep_for = next_due - time.monotonic()
+                    if sleep_for > 0:
+                        self._stop.wait(sleep_for)
+                    else:
+                        next_due = time.monotonic()
+
+            cap.release()
+            if self._stop.is_set():
+                break
+            self.last_error = "Stream ended or read failed"
+            self._set_status("offline")
+            logger.warning(f"Camera {self.camera_id}: stream lost, reconnecting in {delay:.1f}s")
+            self._stop.wait(delay)
+            delay = min(self.reconnect_max, delay * 2)
+            self.reconnects += 1
+
+    def _publish(self, frame, lease=None):
+        """Make frame the latest frame, dropping the previous one if it was never processed"""
+        with self._cond:
+            if self._latest is not None and self._latest_number > self._consumed_number:
+                self.frames_dropped += 1
+                self._release(self._latest_lease)
+                if self.governor is not None:
+                    self.governor.superseded()
+            self._latest = frame
+            self._latest_lease = lease
+            self._latest_number = self.frames_read
+            self._latest_time = time.monotonic()
+            self._cond.notify()
+
+    @staticmethod
+    def _release(lease):
+        if lease is not None:
+            pool, slot = lease
+            pool.release(slot)
+
+    def _process_loop(self):
+        while not self._stop.is_set():
+            with self._cond:
+                while not self._stop.is_set() and self._latest_number <= self._consumed_number:
+                    self._cond.wait(0.5)
+                if self._stop.is_set():
+                    break
+                frame = self._latest
+                # The frame's slot now belongs to this thread
+                lease, self._latest_lease = self._latest_lease, None
+                frame_number = self._latest_number
+                captured_at = self._latest_time
+                self._consumed_number = frame_number
+
+            start = time.monotonic()
+            if self.governor is not None and not self.governor.admit(start - captured_at):
+                self.frames_dropped += 1
+                self._release(lease)
+                continue
+
+            try:
+                self.process_frame(frame_number, frame, self.fps)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.exception(f"Camera {self.camera_id}: error processing frame {frame_number}")
+            finally:
+                self._release(lease)
+            end = time.monotonic()
+            self.last_process_seconds = end - start
+            self.last_frame_age = end - captured_at
+            self.frames_processed += 1
+            if self.governor is not None:
+                self.governor.record(self.last_frame_age, self.last_process_seconds)
+
+        if self.on_stop:
+            self.on_stop()
+
+
+class StreamManager:
+    """
+    Owns the running CameraStream workers, at most one per camera.
+    """
+
+    def __init__(self, stream_factory: Callable[..., CameraStream]):
+        """
+        Args:
+            stream_factory: Called as stream_factory(camera_id, source, **options) to build a worker
+        """
+        self.stream_factory = stream_factory
+        self._lock = threading.Lock()
+        self._streams: Dict[str, CameraStream] = {}
+
+    def start(self, camera_id: str, source: Any, **options) -> CameraStream:
+        """Start (or restart) the stream for a camera"""
+        self.stop(camera_id)
+        stream = self.stream_factory(camera_id, source, **options)
+        with self._lock:
+            self._streams[camera_id] = stream
+        stream.start()
+        return stream
+
+    def stop(self, camera_id: str) -> bool:
+        with self._lock:
+            stream = self._streams.pop(camera_id, None)
+        if stream is None:
+            return False
+        stream.stop()
+        return True
+
+    def stop_all(self):
+        with self._lock:
+            camera_ids = list(self._streams)
+        for camera_id in camera_ids:
+            self.stop(camera_id)
+
+    def get(self, camera_id: str) -> Optional[CameraStream]:
+        with self._lock:
+            return self._streams.get(camera_id)
+
+    def stats(self):
+        with self._lock:
+            streams = list(self._streams.values())
+        return [stream.stats() for stream in streams]
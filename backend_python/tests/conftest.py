@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The backend's modules import each other by their plain names (run.py is
+# started from inside backend_python), so the tests do the same
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,54 @@
+import numpy as np
+
+from clips import ClipEncoder
+from config import INCIDENT_CONFIRM_FRAMES, PROCESSED_FOLDER
+from detection import DetectionSession
+from models.detections import Detections
+from models.yolo_sim import load_model
+
+
+def test_frames_skipped_by_the_motion_gate_dont_reset_confirmation(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / PROCESSED_FOLDER).mkdir(parents=True)
+    model = load_model(latency="none")
+    encoder = ClipEncoder(max_workers=1)
+    session = DetectionSession("cam1", model, 25, encoder)
+
+    accident = Detections(np.array([[40, 40, 120, 100]], dtype=np.float32), np.array([0.9], dtype=np.float32),
+                          model.accident_class_ids[:1].copy(), model.classes)
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    # Each inferred frame is followed by a run of still frames, as the
+    # motion gate produces on a static scene
+    frame_count = 0
+    for _ in range(INCIDENT_CONFIRM_FRAMES):
+        for detections in [accident] + [None] * 20:
+            frame_count += 1
+            session.process_frame(frame_count, frame, detections)
+    session.close()
+    encoder.shutdown(wait=True)
+
+    assert session.incidents_found == 1
+    assert len(session.incidents) == 1
+    assert session.processed_frames == frame_count
+    assert session.inferred_frames == INCIDENT_CONFIRM_FRAMES
+    assert session.tracker.stats()["tracksConfirmed"] == 1
+
+
+class Stream:
+    """Stands in for a DetectionSession as the model's stream key"""
+
+
+def test_simulated_accidents_stay_on_their_stream():
+    model = load_model(latency="none", seed=1, accident_rate=1.0)
+    frame = np.zeros((360, 480, 3), dtype=np.uint8)
+    first, second = Stream(), Stream()
+
+    def accidents(detections):
+        return int(detections.class_mask(model.accident_class_ids).sum())
+
+    assert accidents(model.predict(frame, stream=first)) == 1
+    # No new accidents from here on: only the one in view on the first stream continues
+    model.accident_rate = 0.0
+    assert accidents(model.predict(frame)) == 0
+    assert accidents(model.predict(frame, stream=second)) == 0
+    assert accidents(model.predict(frame, stream=first)) == 1
@@ -0,0 +1,44 @@
+from events import EventBroker
+
+
+def drain(sub):
+    """(id, type) of the events buffered for a subscription"""
+    events = []
+    while not sub.queue.empty():
+        event_id, event_type, _ = sub.queue.get_nowait()
+        events.append((event_id, event_type))
+    return events
+
+
+def test_a_full_subscriber_gets_one_resync_and_is_dropped():
+    broker = EventBroker(max_buffer=2)
+    slow = broker.subscribe()
+    for i in range(5):
+        broker.publish("incident-created", {"id": i})
+
+    assert slow.overflowed
+    assert broker.stats() == {"subscribers": 0, "eventsPublished": 5, "subscribersDropped": 1}
+    # Its buffer holds just the resync, after which the stream ends and the client has to reconnect
+    assert list(broker.stream(slow, keepalive=1)) == [
+        "retry: 3000\n\n", 'event: resync\ndata: {"reason": "slow consumer"}\n\n']
+
+
+def test_last_event_id_replays_missed_events():
+    broker = EventBroker(history=10)
+    for i in range(5):
+        broker.publish("incident-created" if i % 2 else "stats-updated", {"id": i})
+
+    sub = broker.subscribe(types=["incident-created"], last_event_id=1)
+
+    assert drain(sub) == [(2, "incident-created"), (4, "incident-created")]
+
+
+def test_resuming_after_the_history_rolled_over_sends_a_resync_first():
+    broker = EventBroker(history=3)
+    for i in range(6):
+        broker.publish("incident-created", {"id": i})
+
+    # Events 2 and 3 are no longer in the history
+    sub = broker.subscribe(last_event_id=1)
+
+    assert drain(sub) == [(3, "resync"), (4, "incident-created"), (5, "incident-created"), (6, "incident-created")]
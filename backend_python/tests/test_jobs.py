@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from jobs import JobManager, JobQueueFull
+
+
+def record(calls):
+    """Job handler appending its job's name to calls"""
+    def handler(job, name):
+        calls.append(name)
+        return {"name": name}
+    return handler
+
+
+def wait_for(manager, job_id, status):
+    """Follow a job's versions until it reaches status; returns its snapshot"""
+    snapshot = manager.wait(job_id, timeout=5)
+    while snapshot["status"] != status:
+        previous = snapshot["version"]
+        snapshot = manager.wait(job_id, since_version=previous, timeout=5)
+        assert snapshot["version"] > previous, f"job stuck in {snapshot['status']}"
+    return snapshot
+
+
+def test_submit_raises_when_the_queue_is_full():
+    manager = JobManager(max_workers=1, max_queue_size=2)
+    manager.register("record", record([]))
+    manager.submit("record", {"name": "a"})
+    manager.submit("record", {"name": "b"})
+
+    assert manager.is_full()
+    with pytest.raises(JobQueueFull):
+        manager.submit("record", {"name": "c"})
+
+
+def test_jobs_run_by_priority_then_in_submission_order():
+    calls = []
+    manager = JobManager(max_workers=1)
+    manager.register("record", record(calls))
+    jobs = [manager.submit("record", {"name": name}, priority)
+            for name, priority in [("a", 1), ("b", 0), ("c", 1), ("d", 0)]]
+    manager.start()
+
+    for job in jobs:
+        wait_for(manager, job.id, "completed")
+    assert calls == ["b", "d", "a", "c"]
+
+
+def test_unfinished_jobs_are_requeued_on_start(tmp_path):
+    state_path = str(tmp_path / "jobs.json")
+    release = threading.Event()
+    manager = JobManager(max_workers=1, state_path=state_path)
+    manager.register("record", record([]))
+    manager.register("block", lambda job, name: release.wait())
+    manager.start()
+    done = manager.submit("record", {"name": "done"})
+    wait_for(manager, done.id, "completed")
+    running = manager.submit("block", {"name": "running"})
+    wait_for(manager, running.id, "running")
+    queued = manager.submit("record", {"name": "queued"})
+
+    try:
+        calls = []
+        restarted = JobManager(max_workers=1, state_path=state_path)
+        restarted.register("record", record(calls))
+        restarted.register("block", record(calls))
+        assert restarted.stats()["queued"] == 2
+        restarted.start()
+
+        for job in (running, queued):
+            wait_for(restarted, job.id, "completed")
+        assert calls == ["running", "queued"]
+        assert restarted.snapshot(done.id)["result"] == {"name": "done"}
+    finally:
+        release.set()
+
+
+def test_wait_returns_once_the_job_changes_past_the_given_version():
+    manager = JobManager(max_workers=1)
+    manager.register("record", record([]))
+    job = manager.submit("record", {"name": "a"})
+    version = manager.snapshot(job.id)["version"]
+
+    # Nothing has changed yet: the wait times out with the same version
+    assert manager.wait(job.id, since_version=version, timeout=0.05)["version"] == version
+
+    manager.update_progress(job.id, framesInferred=10)
+    snapshot = manager.wait(job.id, since_version=version, timeout=5)
+    assert snapshot["version"] == version + 1
+    assert snapshot["progress"] == {"framesInferred": 10}
+    assert manager.wait("missing", timeout=0.05) is None
@@ -0,0 +1,18 @@
+import numpy as np
+
+from models.detections import Detections
+from models.preprocess import Letterbox
+
+
+def test_restore_drops_boxes_in_the_padding():
+    letterbox = Letterbox((640, 640))
+    # A 640x360 frame is padded by 140 px above and below
+    letterbox.prepare([np.zeros((360, 640, 3), dtype=np.uint8)])
+    detections = Detections(np.array([[10, 10, 100, 60], [10, 100, 200, 200]], dtype=np.float32),
+                            np.array([0.9, 0.8], dtype=np.float32), np.array([0, 1], dtype=np.int32), ["a", "b"])
+
+    restored, = letterbox.restore([detections])
+
+    np.testing.assert_array_equal(restored.boxes, [[10, 0, 200, 60]])
+    np.testing.assert_array_equal(restored.scores, np.array([0.8], dtype=np.float32))
+    np.testing.assert_array_equal(restored.class_ids, [1])
@@ -0,0 +1,110 @@
+import importlib
+import os
+import sys
+import time
+
+import pytest
+
+# Modules that read the settings when imported
+SETTINGS_MODULES = ("config", "detection", "shards", "app")
+
+
+def loaded_modules():
+    """Runs in a shard worker: the modules it has imported"""
+    return sorted(sys.modules)
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    """The server module with its services started, running in a scratch directory"""
+    workdir = tmp_path_factory.mktemp("server")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    env = {
+        "SIMULATOR_LATENCY": "none",
+        "SIMULATOR_SEED": "7",
+        "SIMULATOR_ACCIDENT_RATE": "0.2",
+        "MOTION_GATE": "false",
+        "VIDEO_SHARDS": "2",
+        "VIDEO_SHARD_MIN_SECONDS": "10",
+        "VIDEO_SHARD_WORKERS": "2",
+        "MAX_WORKERS": "1"
+    }
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+
+    from benchmark import synthesize_video
+    os.makedirs("data/uploads/videos")
+    video_path = "data/uploads/videos/long.mp4"
+    synthesize_video(video_path, 160, 120, 25, 40)
+
+    # Settings are read on import, so the modules reading them are loaded afresh
+    for name in SETTINGS_MODULES:
+        sys.modules.pop(name, None)
+    app = importlib.import_module("app")
+    app.start_services()
+    try:
+        yield app, video_path
+    finally:
+        if app.shard_pool is not None:
+            app.shard_pool.shutdown()
+        for name in SETTINGS_MODULES:
+            sys.modules.pop(name, None)
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        os.chdir(cwd)
+
+
+def wait_for(app, job_id, timeout=120):
+    deadline = time.monotonic() + timeout
+    job = app.job_manager.snapshot(job_id)
+    while job["status"] not in ("completed", "failed") and time.monotonic() < deadline:
+        job = app.job_manager.wait(job_id, job["version"], deadline - time.monotonic())
+    return job
+
+
+def test_sharded_video_job(server):
+    app, video_path = server
+    job = app.job_manager.submit("process-video", {"video_path": video_path, "camera_id": "cam1"})
+    job = wait_for(app, job.id)
+
+    assert job["status"] == "completed", job["error"]
+    assert len(job["result"]["shards"]) == 2
+    # Nothing but the submitted job ran
+    assert [entry["id"] for entry in app.job_manager.list()] == [job["id"]]
+
+    # Shard workers never import the server
+    assert "app" not in app.get_shard_pool().submit(loaded_modules).result()
+
+    app.clip_encoder.shutdown(wait=True)
+    incidents, _ = app.incident_store.query(limit=100, since=0)
+    assert len(incidents) == job["result"]["incidentsFound"] > 0
+    assert [int(incident["id"]) for incident in incidents] == list(range(1, len(incidents) + 1))
+    for incident in incidents:
+        for url in (incident["imageUrl"], incident["videoUrl"]):
+            assert os.path.isfile(os.path.join(app.PROCESSED_FOLDER, os.path.basename(url)))
+
+
+def test_process_video_rejects_a_bad_priority(server):
+    app, video_path = server
+    client = app.app.test_client()
+    for priority in ("high", None, 1.5):
+        response = client.post(f"/api/process-video/{os.path.basename(video_path)}", json={"priority": priority})
+        assert response.status_code == 400
+        assert response.get_json() == {"error": "priority must be an integer"}
+
+
+def test_stopping_a_stream_puts_the_camera_back_to_monitoring(server):
+    app, video_path = server
+    client = app.app.test_client()
+    assert client.post("/api/cameras/cam2/stream", json={"streamUrl": os.path.abspath(video_path)}).status_code == 201
+    deadline = time.monotonic() + 10
+    while app.cameras["cam2"]["status"] == "connecting" and time.monotonic() < deadline:
+        time.sleep(0.05)
+    app.cameras.update("cam2", None, status="incident")
+
+    assert client.delete("/api/cameras/cam2/stream").status_code == 200
+    assert app.cameras["cam2"]["status"] == "monitoring"
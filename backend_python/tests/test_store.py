@@ -0,0 +1,93 @@
+import threading
+
+from store import IncidentStore
+
+
+def make_incident(incident_id):
+    return {
+        "id": str(incident_id),
+        "cameraId": "cam1",
+        "location": "Test",
+        "timestamp": "2024-01-01T00:00:00",
+        "type": "accident",
+        "severity": "high"
+    }
+
+
+def test_polling_with_since_sees_every_incident(tmp_path):
+    store = IncidentStore(str(tmp_path / "incidents.db"), batch_size=3, flush_interval=0.01)
+    writers = [threading.Thread(target=lambda: [store.add(make_incident) for _ in range(100)])
+               for _ in range(4)]
+    for writer in writers:
+        writer.start()
+
+    # Poll the way a dashboard does while the writers are adding
+    seen = []
+    while len(seen) < 400:
+        page, _ = store.query(limit=50, since=int(seen[-1]) if seen else 0, fields=["id"])
+        seen.extend(incident["id"] for incident in page)
+    for writer in writers:
+        writer.join()
+
+    assert [int(incident_id) for incident_id in seen] == list(range(1, 401))
+
+
+def test_ids_continue_after_a_restart(tmp_path):
+    path = str(tmp_path / "incidents.db")
+    store = IncidentStore(path)
+    assert store.add(make_incident)["id"] == "1"
+    store.flush()
+    assert IncidentStore(path).add(make_incident)["id"] == "2"
+
+
+def incident_with(**fields):
+    """Incident builder overriding make_incident's fields"""
+    return lambda incident_id: {**make_incident(incident_id), **fields}
+
+
+def test_cursor_pages_end_with_no_next_cursor(tmp_path):
+    store = IncidentStore(str(tmp_path / "incidents.db"))
+    for _ in range(5):
+        store.add(make_incident)
+
+    first, cursor = store.query(limit=2, fields=["id"])
+    second, cursor = store.query(limit=2, cursor=cursor, fields=["id"])
+    last, last_cursor = store.query(limit=2, cursor=cursor, fields=["id"])
+
+    assert [[incident["id"] for incident in page] for page in (first, second, last)] == [["5", "4"], ["3", "2"], ["1"]]
+    assert last_cursor is None
+    # A page that exactly reaches the oldest incident is the last one too
+    assert store.query(limit=3, cursor=4, fields=["id"]) == ([{"id": "3"}, {"id": "2"}, {"id": "1"}], None)
+
+
+def test_query_filters(tmp_path):
+    store = IncidentStore(str(tmp_path / "incidents.db"))
+    store.add(incident_with(cameraId="cam1", type="accident", severity="high", timestamp="2024-01-01T10:00:00"))
+    store.add(incident_with(cameraId="cam2", type="accident", severity="low", timestamp="2024-01-02T10:00:00"))
+    store.add(incident_with(cameraId="cam1", type="fire", severity="medium", timestamp="2024-01-03T10:00:00"))
+    store.add(incident_with(cameraId="cam3", type="fire", severity="high", timestamp="2024-01-04T10:00:00"))
+
+    def ids(**filters):
+        incidents, _ = store.query(fields=["id"], **filters)
+        return sorted(int(incident["id"]) for incident in incidents)
+
+    assert ids(camera_ids=["cam1"]) == [1, 3]
+    assert ids(camera_ids=["cam2", "cam3"]) == [2, 4]
+    assert ids(types=["fire"]) == [3, 4]
+    assert ids(severities=["high", "low"]) == [1, 2, 4]
+    assert ids(start="2024-01-02T00:00:00") == [2, 3, 4]
+    assert ids(end="2024-01-03T10:00:00") == [1, 2]
+    assert ids(start="2024-01-02T00:00:00", end="2024-01-04T00:00:00", camera_ids=["cam1"]) == [3]
+
+
+def test_fields_projection(tmp_path):
+    store = IncidentStore(str(tmp_path / "incidents.db"))
+    store.add(make_incident)
+
+    incidents, _ = store.query(fields=["id", "cameraId", "unknown"])
+    assert incidents == [{"id": "1", "cameraId": "cam1"}]
+
+    # timeAgo is derived from the timestamp column, which isn't itself returned
+    incidents, _ = store.query(fields=["timeAgo"])
+    assert list(incidents[0]) == ["timeAgo"]
+    assert incidents[0]["timeAgo"].endswith("days ago")
@@ -0,0 +1,128 @@
+import numpy as np
+from typing import Any, Dict
+
+
+def pairwise_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU of every box in a (N x 4, x1 y1 x2 y2) with every box in b (M x 4), as an N x M array"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+class IoUTracker:
+    """
+    Lightweight IoU tracker that confirms objects seen in N of the last M frames.
+
+    Detections are matched greedily to existing tracks by IoU. Each track
+    keeps a bitmask of the frames it was matched in over the last M
+    updates; a track is confirmed the first time N of those bits are set,
+    and is dropped once none are. Track state is a handful of preallocated
+    arrays, so a camera's tracker costs a few hundred bytes.
+    """
+
+    MAX_WINDOW = 32
+
+    def __init__(self, iou_threshold: float = 0.3, confirm_hits: int = 3, window: int = 5, capacity: int = 16):
+        """
+        Initialize the tracker
+
+        Args:
+            iou_threshold: Minimum IoU for a detection to continue a track
+            confirm_hits: N, frames a track must be seen in to be confirmed
+            window: M, number of most recent frames considered (at most 32)
+            capacity: Initial number of track slots (grows as needed)
+        """
+        self.iou_threshold = iou_threshold
+        self.window = min(self.MAX_WINDOW, max(1, window))
+        self.confirm_hits = min(self.window, max(1, confirm_hits))
+        self._window_mask = np.uint32((1 << self.window) - 1)
+
+        self.boxes = np.zeros((capacity, 4), dtype=np.float32)
+        self.history = np.zeros(capacity, dtype=np.uint32)
+        self.confirmed = np.zeros(capacity, dtype=bool)
+        self.track_ids = np.zeros(capacity, dtype=np.int64)
+        self.count = 0
+        self._next_id = 1
+        self.tracks_started = 0
+        self.tracks_confirmed = 0
+
+    def update(self, boxes: np.ndarray) -> np.ndarray:
+        """
+        Advance one frame with that frame's detections
+
+        Args:
+            boxes: N x 4 boxes detected in this frame
+
+        Returns:
+            Indices into boxes of the detections whose track was confirmed by this frame
+        """
+        count = self.count
+        self.history[:count] = (self.history[:count] << np.uint32(1)) & self._window_mask
+
+        assigned = np.full(len(boxes), -1, dtype=np.int64)
+        if count and len(boxes):
+            iou = pairwise_iou(self.boxes[:count], boxes)
+            # Greedy matching, best pairs first
+            for _ in range(min(count, len(boxes))):
+                track, det = np.unravel_index(np.argmax(iou), iou.shape)
+                if iou[track, det] < self.iou_threshold:
+                    break
+                assigned[det] = track
+                iou[track, :] = -1
+                iou[:, det] = -1
+            matched = assigned >= 0
+            self.boxes[assigned[matched]] = boxes[matched]
+            self.history[assigned[matched]] |= np.uint32(1)
+
+        new = np.flatnonzero(assigned < 0)
+        if len(new):
+            self._reserve(count + len(new))
+            slots = np.arange(count, count + len(new))
+            self.boxes[slots] = boxes[new]
+            self.history[slots] = 1
+            self.confirmed[slots] = False
+            self.track_ids[slots] = np.arange(self._next_id, self._next_id + len(new))
+            self._next_id += len(new)
+            self.tracks_started += len(new)
+            assigned[new] = slots
+            self.count = count = count + len(new)
+
+        # Confirm tracks that reached N hits in the window
+        hits = np.bitwise_count(self.history[:count])
+        newly_confirmed = (hits >= self.confirm_hits) & ~self.confirmed[:count]
+        self.confirmed[:count] |= newly_confirmed
+        self.tracks_confirmed += int(newly_confirmed.sum())
+        confirmed_detections = np.flatnonzero(newly_confirmed[assigned]) if len(boxes) else assigned
+
+        # Drop tracks that weren't seen anywhere in the window
+        alive = self.history[:count] != 0
+        if not alive.all():
+            keep = np.flatnonzero(alive)
+            for array in (self.boxes, self.history, self.confirmed, self.track_ids):
+                array[:len(keep)] = array[keep]
+            self.count = len(keep)
+
+        return confirmed_detections
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "activeTracks": self.count,
+            "tracksStarted": self.tracks_started,
+            "tracksConfirmed": self.tracks_confirmed
+        }
+
+    def _reserve(self, size: int):
+        capacity = len(self.history)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        self.boxes = np.resize(self.boxes, (capacity, 4))
+        self.history = np.resize(self.history, capacity)
+        self.confirmed = np.resize(self.confirmed, capacity)
+        self.track_ids = np.resize(self.track_ids, capacity)
@@ -0,0 +1,161 @@
+import cv2
+import numpy as np
+import logging
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from framepool import FramePool
+from metrics import StageTimer
+
+logger = logging.getLogger(__name__)
+
+# Sampling modes
+SAMPLING_GRAB = "grab"  # grab() every frame, retrieve() only the sampled ones
+SAMPLING_SEEK = "seek"  # seek directly to each sampled frame
+SAMPLING_AUTO = "auto"  # seek when sampling is sparse, grab otherwise
+SAMPLING_MODES = (SAMPLING_GRAB, SAMPLING_SEEK, SAMPLING_AUTO)
+
+# In auto mode, seek when at least this many frames are skipped per sample.
+# Seeking decodes forward from the previous keyframe, so it only pays off
+# when the gap between samples is large compared to the keyframe interval.
+SEEK_MIN_INTERVAL = 60
+
+
+class FrameSampler:
+    """
+    Reads every Nth frame of a video and groups the sampled frames into batches.
+
+    Skipped frames are never converted to BGR images: in grab mode they are
+    only demuxed/decoded with cap.grab(), and in seek mode they are skipped
+    over entirely by setting the capture position. With a FramePool, each
+    batch is decoded straight into a pool slot instead of being stacked
+    into a new array.
+    """
+
+    def __init__(self, cap: cv2.VideoCapture, interval: int = 1, batch_size: int = 1,
+                 mode: str = SAMPLING_AUTO, timer: Optional[StageTimer] = None,
+                 start_frame: int = 0, end_frame: Optional[int] = None, pool: Optional[FramePool] = None):
+        """
+        Initialize the sampler
+
+        Args:
+            cap: Opened video capture to read from
+            interval: Sample every `interval`-th frame
+            batch_size: Number of sampled frames per batch
+            mode: One of SAMPLING_MODES
+            timer: Records the time taken to read each sampled frame as the "read" stage
+            start_frame: Frames to skip (by seeking) before sampling starts
+            end_frame: Last frame number that may be sampled (None = end of the video)
+            pool: Pool with batch_size frames per slot to decode into (None allocates each batch)
+        """
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: {mode}")
+
+        self.cap = cap
+        self.interval = max(1, interval)
+        self.batch_size = max(1, batch_size)
+        if mode == SAMPLING_AUTO:
+            mode = SAMPLING_SEEK if self.interval >= SEEK_MIN_INTERVAL else SAMPLING_GRAB
+        self.mode = mode
+        self.timer = timer
+        self.end_frame = end_frame
+        self.pool = pool
+
+        # Frames advanced past in the video, and frames actually retrieved as images
+        self.frames_decoded = 0
+        self.frames_retrieved = 0
+        # Number of the last frame advanced past; sampling stays aligned to
+        # multiples of interval whatever the start frame
+        self.position = 0
+        if start_frame > 0:
+            if not self.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame):
+                logger.warning("Video source does not support seeking, grabbing through to the start frame")
+                while self.position < start_frame and self.cap.grab():
+                    self.position += 1
+            else:
+                self.position = start_frame
+
+    def __iter__(self) -> Iterator[Tuple[List[int], np.ndarray, Optional[int]]]:
+        """
+        Yield (frame_numbers, frames, slot) batches
+
+        Frame numbers are 1-based positions in the video. frames is a stacked
+        N x H x W x 3 array; the final batch may be short. When the frames
+        are in a pool slot, slot is its index and the consumer must release
+        it once done with the frames; otherwise slot is None.
+        """
+        indices = []
+        frames = []
+        slot = None
+        read_frame = self._seek_next if self.mode == SAMPLING_SEEK else self._grab_next
+        try:
+            while self.cap.isOpened():
+                if self.pool is not None and slot is None:
+                    slot = self.pool.acquire()
+                out = self.pool.view(slot)[len(frames)] if slot is not None else None
+
+                start = time.perf_counter()
+                frame = read_frame(out)
+                if frame is None:
+                    break
+                if self.timer is not None:
+                    self.timer.observe("read", time.perf_counter() - start)
+                if out is not None and not np.shares_memory(frame, out):
+                    # OpenCV allocated a new image: the frames aren't the size the pool was made for
+                    logger.warning(f"Frame size {frame.shape} doesn't match the frame pool, decoding without it")
+                    frames = [np.copy(f) for f in frames]
+                    self.pool.release(slot)
+                    self.pool = slot = None
+
+                self.frames_retrieved += 1
+                indices.append(self.position)
+                frames.append(frame)
+                if len(frames) == self.batch_size:
+                    yield self._batch(indices, frames, slot)
+                    indices = []
+                    frames = []
+                    slot = None
+
+            if frames:
+                yield self._batch(indices, frames, slot)
+                slot = None
+        finally:
+            # A slot acquired for a batch that was never handed out
+            if slot is not None:
+                self.pool.release(slot)
+
+    def _batch(self, indices, frames, slot):
+        if slot is None:
+            return indices, np.stack(frames), None
+        return indices, self.pool.view(slot)[:len(frames)], slot
+
+    def _grab_next(self, out: Optional[np.ndarray] = None):
+        """Advance to the next sampled frame with grab() and decode only that one (into out, if given)"""
+        while True:
+            if self.end_frame is not None and self.position >= self.end_frame:
+                return None
+            if not self.cap.grab():
+                return None
+            self.position += 1
+            self.frames_decoded += 1
+            if self.position % self.interval == 0:
+                ret, frame = self.cap.retrieve(out)
+                return frame if ret else None
+
+    def _seek_next(self, out: Optional[np.ndarray] = None):
+        """Seek directly to the next sampled frame (decoding it into out, if given)"""
+        target = (self.position // self.interval + 1) * self.interval
+        if self.end_frame is not None and target > self.end_frame:
+            return None
+        if not self.cap.set(cv2.CAP_PROP_POS_FRAMES, target - 1):
+            # Backend can't seek; fall back to grabbing through the gap
+            logger.warning("Video source does not support seeking, falling back to grab sampling")
+            self.mode = SAMPLING_GRAB
+            return self._grab_next(out)
+
+        ret, frame = self.cap.read(out)
+        if not ret:
+            return None
+        self.frames_decoded += target - self.position
+        self.position = target
+        return frame
@@ -122,12 +122,27 @@ export default function VideoUpload() {
         throw new Error('Failed to process video');
       }
       
-      return response.json();
+      // Processing runs as a background job; long-poll it until it finishes
+      let job = await response.json();
+      let version = -1;
+      while (job.status !== 'completed') {
+        const jobResponse = await fetch(`/api/jobs/${job.jobId ?? job.id}?wait=20&since=${version}`);
+        if (!jobResponse.ok) {
+          throw new Error('Failed to fetch processing status');
+        }
+        job = await jobResponse.json();
+        version = job.version;
+        if (job.status === 'failed') {
+          throw new Error(job.error || 'Failed to process video');
+        }
+      }
+      
+      return job.result;
     },
     onSuccess: (data) => {
       toast({
         title: "Processing Complete",
-        description: `Video processed successfully. ${data.incidentsDetected ? `${data.incidentsDetected} incidents detected.` : 'No incidents detected.'}`,
+        description: `Video processed successfully. ${data.incidentsFound ? `${data.incidentsFound} incidents detected.` : 'No incidents detected.'}`,
       });
       // Invalidate relevant queries after processing is complete
       queryClient.invalidateQueries({ queryKey: ['/api/incidents'] });
@@ -120,6 +120,11 @@ function createProxyMiddleware(req: Request, res: Response, next: NextFunction)
     '/api/upload',
     '/api/videos',
     '/api/process-video',
+    '/api/jobs',
+    '/api/streams',
+    '/api/events',
+    '/api/models',
+    '/metrics',
     '/data/uploads/videos/',
     '/data/processed/videos/'
   ];